@@ -0,0 +1,187 @@
+import bisect
+import os
+import numpy as np
+from brainflow.board_shim import BoardShim, BoardIds
+
+from Board import GAP_MARKER
+
+# Reason bits stored with each bad span
+AMPLITUDE, FLATLINE, LINE_NOISE, GAP = 1, 2, 4, 8
+
+
+def bad_spans_path(fname):
+    '''
+    recording file name -> file name of its bad-span index
+    '''
+    root, _ = os.path.splitext(fname)
+    return f"{root}_bad_spans.csv"
+
+
+# Compact index of flagged [start, stop) sample ranges, kept in arrival order
+class BadSpanIndex:
+    def __init__(self):
+        self.starts = []
+        self.stops = []
+        self.flags = []
+        self.start_times = []  # board timestamps of the first and last flagged sample,
+        self.stop_times = []   # so spans can be found again in a file that holds other sessions too
+        self.n_checked = 0  # samples screened so far; anything past this is not known to be clean
+        self.n_saved = 0  # spans already flushed to disk
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, start, stop, flags, start_time, stop_time):
+        if self.stops and self.stops[-1] == start:  # extend the previous span
+            self.stops[-1] = stop
+            self.flags[-1] |= flags
+            self.stop_times[-1] = stop_time
+        else:
+            self.starts.append(start)
+            self.stops.append(stop)
+            self.flags.append(flags)
+            self.start_times.append(start_time)
+            self.stop_times.append(stop_time)
+
+    def is_bad(self, start, stop):
+        '''
+        -> True if [start, stop) overlaps a flagged span
+        '''
+        i = bisect.bisect_right(self.starts, stop - 1)  # spans starting before stop
+        return i > 0 and self.stops[i - 1] > start
+
+    def n_closed(self):
+        '''
+        -> number of spans that can no longer grow
+        '''
+        if self.stops and self.stops[-1] == self.n_checked:
+            return len(self) - 1  # the last span may still be extended by the next segment
+        return len(self)
+
+    def flush(self, fname, final=False):
+        '''
+        append the spans that can no longer grow to fname (all of them if final)
+        '''
+        n_closed = len(self) if final else self.n_closed()
+        if n_closed == self.n_saved:
+            return
+        rows = np.column_stack([
+            self.start_times[self.n_saved:n_closed],
+            self.stop_times[self.n_saved:n_closed],
+            self.flags[self.n_saved:n_closed],
+        ])
+        new_file = not os.path.exists(fname)
+        with open(fname, 'a') as f:
+            np.savetxt(f, rows, fmt=['%.6f', '%.6f', '%d'], delimiter=',',
+                       header='start_time,stop_time,flags' if new_file else '')
+        self.n_saved = n_closed
+
+    @staticmethod
+    def read(fname):
+        '''
+        -> (n_spans, 3) array of start_time, stop_time, flags; empty if there is no span file
+        '''
+        if not os.path.exists(fname):
+            return np.zeros((0, 3))
+        return np.loadtxt(fname, delimiter=',', ndmin=2)
+
+    def add_times(self, spans, timestamps, offset=0):
+        '''
+        map the spans (as from read) onto a chunk of a recording with these timestamps,
+        whose first sample is sample offset of the recording; call chunk by chunk, in order
+        '''
+        starts = np.searchsorted(timestamps, spans[:, 0], side='left')
+        stops = np.searchsorted(timestamps, spans[:, 1], side='right')
+        for start, stop, (t0, t1, flags) in zip(starts, stops, spans):
+            if stop > start:  # spans outside this chunk map to nothing
+                self.add(offset + int(start), offset + int(stop), int(flags), t0, t1)
+        self.n_checked = offset + len(timestamps)
+
+    @classmethod
+    def load(cls, fname, timestamps):
+        '''
+        span file + timestamp row of a recording -> index in that recording's sample numbers
+        '''
+        index = cls()
+        index.add_times(cls.read(fname), timestamps)
+        index.n_checked = np.inf  # offline: everything that was recorded has been screened
+        return index
+
+
+def board_detector(board_id):
+    '''
+    -> ArtifactDetector with the thresholds the client uses for this board
+    '''
+    if board_id == BoardIds.SYNTHETIC_BOARD:
+        # Synthetic channels are fixed sinusoids of up to ~1 mV, two of them at 50/60 Hz
+        return ArtifactDetector(board_id, amplitude=None, line_ratio=None)
+    return ArtifactDetector(board_id)
+
+
+# Screens the stream in fixed segments; a segment is bad if any channel fails a check
+class ArtifactDetector:
+    def __init__(self, board_id=BoardIds.GANGLION_BOARD, segment_seconds=0.5, channels=None,
+                 amplitude=200, flatline=0.5, line_freq=60, line_ratio=0.5):
+        '''
+        amplitude: max peak-to-peak per segment, in board units (uV)
+        flatline: min standard deviation per segment, in board units (uV)
+        line_ratio: max share of 1 Hz+ power within 2 Hz of line_freq
+        any threshold set to None disables that check
+        A segment holding a reconnect (Board.GAP_MARKER) is always bad: its samples are not continuous.
+        '''
+        self.sampling_rate = BoardShim.get_sampling_rate(board_id)
+        self.channels = BoardShim.get_eeg_channels(board_id) if channels is None else channels
+        self.timestamp_channel = BoardShim.get_timestamp_channel(board_id)
+        self.marker_channel = BoardShim.get_marker_channel(board_id)
+        self.segment_length = int(round(segment_seconds * self.sampling_rate))
+        self.amplitude = amplitude
+        self.flatline = flatline
+        self.line_ratio = line_ratio
+
+        freqs = np.fft.rfftfreq(self.segment_length, 1 / self.sampling_rate)
+        self.line_bins = np.abs(freqs - line_freq) <= 2
+        self.signal_bins = freqs >= 1
+
+        self.index = BadSpanIndex()
+        self.bad_channels = np.zeros(len(self.channels), dtype=bool)  # per-channel result of the latest segment
+        self.tail = np.zeros((len(self.channels), 0))
+        self.tail_times = np.zeros(0)
+        self.tail_markers = np.zeros(0)
+
+    def append(self, data):
+        '''
+        board data (n_rows, n_samples) -> number of newly flagged segments
+        '''
+        buf = np.concatenate((self.tail, data[self.channels]), axis=1)
+        times = np.concatenate((self.tail_times, data[self.timestamp_channel]))
+        markers = np.concatenate((self.tail_markers, data[self.marker_channel]))
+        L = self.segment_length
+        n_segments = buf.shape[1] // L
+        self.tail = buf[:, n_segments * L:]
+        self.tail_times = times[n_segments * L:]
+        self.tail_markers = markers[n_segments * L:]
+        if n_segments == 0:
+            return 0
+
+        segments = buf[:, :n_segments * L].reshape(len(self.channels), n_segments, L)
+        flags = np.zeros(segments.shape[:2], dtype=int)  # (n_channels, n_segments)
+        if self.amplitude is not None:
+            flags |= (np.ptp(segments, axis=-1) > self.amplitude) * AMPLITUDE
+        centred = segments - segments.mean(axis=-1, keepdims=True)
+        if self.flatline is not None:
+            flags |= (centred.std(axis=-1) < self.flatline) * FLATLINE
+        if self.line_ratio is not None:
+            power = np.abs(np.fft.rfft(centred, axis=-1)) ** 2
+            ratio = power[..., self.line_bins].sum(axis=-1) / (power[..., self.signal_bins].sum(axis=-1) + np.finfo(float).tiny)
+            flags |= (ratio > self.line_ratio) * LINE_NOISE
+        self.bad_channels = flags[:, -1] != 0
+
+        segment_flags = np.bitwise_or.reduce(flags, axis=0)
+        segment_flags |= (markers[:n_segments * L].reshape(n_segments, L) == GAP_MARKER).any(axis=-1) * GAP
+        first = self.index.n_checked
+        bad = np.flatnonzero(segment_flags)
+        for k in bad:
+            self.index.add(first + k * L, first + (k + 1) * L, int(segment_flags[k]),
+                           times[k * L], times[(k + 1) * L - 1])
+        self.index.n_checked += n_segments * L
+        return len(bad)
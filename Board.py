@@ -2,39 +2,113 @@ import sys
 import time
 import numpy as np
 import os
+import threading
 from datetime import datetime  # Import datetime for timestamps
 from brainflow.board_shim import BoardShim, BrainFlowInputParams, BoardIds
 from brainflow import DataFilter
 
+# Written to the marker channel on the first sample after a reconnect; trigger markers are positive
+GAP_MARKER = -1
+
 # Define the Board class to handle BrainFlow session
 class Board:
-    def __init__(self, board_id, params = BrainFlowInputParams()):
+    def __init__(self, board_id, params = BrainFlowInputParams(), base_delay=0.5, max_delay=10.0,
+                 stall_timeout=2.0, on_status=None):
         self.board_id = board_id
         self.params = params
         self.board = None
+        self.marker_channel = BoardShim.get_marker_channel(self.board_id)
+        self.num_rows = BoardShim.get_num_rows(self.board_id)
+
+        # Reconnection policy
+        self.base_delay = base_delay  # first retry delay in seconds, doubled on each failure
+        self.max_delay = max_delay
+        self.stall_timeout = stall_timeout  # seconds without new samples before reconnecting
+        self.on_status = on_status  # optional callback: 'connected' / 'reconnecting' / 'stopped'
+        self.stop_event = threading.Event()
+        self.last_sample_time = None
+        self.gap_pending = False
+        self.reconnects = 0
 
     def __del__(self):
         if self.board and self.board.is_prepared():
             self.board.release_session()
             print("Board session released in destructor.")
 
-    def start_session(self):
-        while True:
+    def set_status(self, status):
+        if self.on_status is not None:
+            self.on_status(status)
+
+    def start_session(self, max_attempts=None):
+        '''
+        -> True once streaming, False if stopped or out of attempts
+        '''
+        delay = self.base_delay
+        attempt = 0
+        while not self.stop_event.is_set():
+            attempt += 1
             try:
                 # Initialize and start the board session
                 self.board = BoardShim(self.board_id, self.params)
                 self.board.prepare_session()
                 self.board.start_stream()
+                self.last_sample_time = time.monotonic()
                 print("Session started.")
-                return
-            
+                self.set_status('connected')
+                return True
+
             except Exception as e:
                 print(f"Error during board session: {e}")
-            print("Retrying...")
-            
+                self.release()
+            if max_attempts is not None and attempt >= max_attempts:
+                break
+            print(f"Retrying in {delay:.1f} s...")
+            self.stop_event.wait(delay)  # returns early if the session is being stopped
+            delay = min(2 * delay, self.max_delay)
+        self.set_status('stopped')
+        return False
+
+    def release(self):
+        try:
+            if self.board is not None and self.board.is_prepared():
+                self.board.release_session()
+        except Exception as e:
+            print(f"Error during releasing session: {e}")
+
+    def reconnect(self):
+        print("Stream lost, reconnecting...")
+        self.set_status('reconnecting')
+        self.release()
+        self.gap_pending = True
+        self.reconnects += 1
+        return self.start_session()
+
+    def get_data(self):
+        '''
+        -> new board data (n_rows, n_samples); reconnects if the stream failed or stalled.
+        The first sample after a reconnect carries GAP_MARKER in the marker channel.
+        '''
+        try:
+            data = self.board.get_board_data()
+        except Exception as e:
+            print(f"Error during data read: {e}")
+            data = None
+
+        now = time.monotonic()
+        if data is not None and data.shape[1] > 0:
+            self.last_sample_time = now
+            if self.gap_pending:
+                data[self.marker_channel, 0] = GAP_MARKER
+                self.gap_pending = False
+            return data
+        if data is None or now - self.last_sample_time > self.stall_timeout:
+            self.reconnect()
+        return np.zeros((self.num_rows, 0))
+
     def stop_session(self):
+        self.stop_event.set()
         try:
-            if self.board is not None:
+            if self.board is not None and self.board.is_prepared():
                 # Stop the board stream and release the session
                 self.board.stop_stream()
                 self.board.release_session()
@@ -54,7 +128,11 @@ class Board:
             print(f"Error during data recording: {e}")
 
     def insert_marker(self, id):
-        self.board.insert_marker(id)
+        try:
+            self.board.insert_marker(id)
+        except Exception as e:
+            # e.g. while reconnecting; the trigger is lost but the session carries on
+            print(f"Error during marker insertion: {e}")
 
 def main():
     params = BrainFlowInputParams()
@@ -70,7 +148,7 @@ def main():
         # Collect data every 2 seconds
         while True:
             time.sleep(2)
-            print(board.board.get_board_data())
+            print(board.get_data())
     except KeyboardInterrupt:
         # Stop session on interrupt
         print("\nStopping session...")
@@ -0,0 +1,224 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from brainflow.board_shim import BoardShim, BoardIds
+
+from lazy_imports import lazy_module
+signal = lazy_module('scipy.signal')  # first needed when the first epoch completes
+
+# Defaults shared with result.py
+TMIN, TMAX = -0.5, 1  # in seconds
+THETA_BAND = (4, 8)  # in Hz
+BANDS = {'delta': (1, 4), 'theta': THETA_BAND, 'alpha': (8, 13), 'beta': (13, 30)}
+
+
+# Marker-locked epochs extracted once, as the samples arrive
+class EpochStore:
+    def __init__(self, board_id=BoardIds.GANGLION_BOARD, tmin=TMIN, tmax=TMAX, channels=None,
+                 scale=1e-6, capacity=64, bad_spans=None):
+        self.board_id = board_id
+        self.bad_spans = bad_spans  # Artifacts.BadSpanIndex; epochs overlapping a bad span are skipped
+        self.sampling_rate = BoardShim.get_sampling_rate(board_id)
+        self.channels = BoardShim.get_eeg_channels(board_id) if channels is None else channels
+        self.marker_channel = BoardShim.get_marker_channel(board_id)
+        self.scale = scale  # board units -> V (boards report in uV)
+
+        # Same sample window as mne.Epochs: round(tmin * sr) .. round(tmax * sr), inclusive
+        self.n_pre = int(round(-tmin * self.sampling_rate))
+        self.n_post = int(round(tmax * self.sampling_rate))
+        self.n_times = self.n_pre + self.n_post + 1
+        self.times = np.arange(-self.n_pre, self.n_post + 1) / self.sampling_rate
+        n_channels = len(self.channels)
+
+        # Spectrum layout is fixed by the epoch length, so work it out once
+        # (mne's Epochs.compute_psd(method='welch') uses one segment of up to 2048 samples)
+        self.nperseg = min(2048, self.n_times)
+        self.freqs = np.fft.rfftfreq(self.nperseg, 1 / self.sampling_rate)
+        self.i4 = find_nearest(self.freqs, THETA_BAND[0])
+        self.i8 = find_nearest(self.freqs, THETA_BAND[1])
+
+        self.n_epochs = 0
+        self.n_rejected = 0
+        self.data = np.empty((capacity, n_channels, self.n_times))
+        self.psd = np.empty((capacity, n_channels, len(self.freqs)))
+        self.band_power = np.empty(capacity)
+        self.event_ids = np.empty(capacity)
+        self.onsets = np.empty(capacity, dtype=np.int64)
+        # Running event-locked average: event id -> (sum of its baselined epochs (n_channels, n_times), count),
+        # replaced as a pair so the GUI thread never sees a sum without its count
+        self.erp_sums = {}
+
+        # Streaming state
+        self.n_samples = 0  # samples seen so far
+        self.tail = np.zeros((n_channels, 0))  # most recent samples, enough to cover one epoch
+        self.pending = []  # (onset, event_id) still waiting for their post-stimulus samples
+        self.clear_from = None  # set by clear(), applied by the next append
+        self.n_clears = 0  # lets readers tell a cleared store from one that did not change
+
+    def clear(self, first_sample):
+        '''
+        forget the epochs with onsets before first_sample (e.g. the stream sample a test starts at)
+        Applied by the next append, on the thread feeding the store. Sample numbers carry on, so
+        onsets stay in step with the stream and the bad-span index.
+        '''
+        self.clear_from = first_sample
+
+    def append(self, data):
+        '''
+        board data (n_rows, n_samples) -> completed epochs are stored with their spectra
+        '''
+        if self.clear_from is not None:
+            # stored epochs all predate first_sample: a later one could not have completed yet
+            self.pending = [(onset, event_id) for onset, event_id in self.pending if onset >= self.clear_from]
+            self.clear_from = None
+            self.n_epochs = 0
+            self.n_rejected = 0
+            self.erp_sums = {}
+            self.n_clears += 1
+        n = data.shape[1]
+        if n == 0 and not self.pending:
+            return
+        markers = data[self.marker_channel]
+        idx = np.flatnonzero(markers > 0)  # negative codes are bookkeeping (e.g. Board.GAP_MARKER)
+        self.pending.extend(zip((self.n_samples + idx).tolist(), markers[idx].tolist()))
+
+        buf = np.concatenate((self.tail, data[self.channels] * self.scale), axis=1)
+        self.n_samples += n
+        buf_start = self.n_samples - buf.shape[1]
+
+        # Epochs also wait until the artifact screen has caught up with their last sample
+        checked = self.n_samples if self.bad_spans is None else min(self.n_samples, self.bad_spans.n_checked)
+        waiting = []
+        ready = []
+        for onset, event_id in self.pending:
+            if onset + self.n_post >= checked:
+                waiting.append((onset, event_id))
+            elif onset - self.n_pre < 0:  # mne drops epochs that start before the recording
+                continue
+            elif self.bad_spans is not None and self.bad_spans.is_bad(onset - self.n_pre, onset + self.n_post + 1):
+                self.n_rejected += 1
+            else:
+                ready.append((onset, event_id))
+        if ready:
+            onsets, event_ids = np.array(ready).T
+            self.add_epochs(epoch_view(buf, onsets.astype(int) - self.n_pre - buf_start, self.n_times),
+                            event_ids, onsets)
+        self.pending = waiting
+        self.tail = buf[:, -(self.n_times + self.n_samples - checked):]
+
+    def add_epochs(self, epochs, event_ids, onsets):
+        '''
+        (n_epochs, n_channels, n_times) -> stored with their spectra, in one batched Welch call
+        '''
+        while self.n_epochs + len(epochs) > self.data.shape[0]:
+            self.grow()
+        i, j = self.n_epochs, self.n_epochs + len(epochs)
+        self.data[i:j], _, self.psd[i:j] = epoch_psd(epochs, self.sampling_rate, self.n_pre)
+        self.band_power[i:j] = self.psd[i:j, :, self.i4:self.i8].mean(axis=(1, 2))
+        self.event_ids[i:j] = event_ids
+        self.onsets[i:j] = onsets
+        for k in range(i, j):  # O(window) per epoch, however long the session gets
+            event_id = int(self.event_ids[k])
+            total, count = self.erp_sums.get(event_id, (0, 0))
+            self.erp_sums[event_id] = (total + self.data[k], count + 1)
+        self.n_epochs = j  # publish last so readers never see a half-written epoch
+
+    def grow(self):
+        capacity = 2 * self.data.shape[0]
+        for name in ('data', 'psd', 'band_power', 'event_ids', 'onsets'):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def select(self, event_id=None, epochs=None):
+        '''
+        -> indices of the stored epochs matching event_id, optionally restricted to
+        epochs (a slice or index array over the matching epochs, in arrival order)
+        '''
+        n = self.n_epochs
+        idx = np.arange(n) if event_id is None else np.flatnonzero(self.event_ids[:n] == event_id)
+        if epochs is not None:
+            idx = idx[epochs]
+        return idx
+
+    def band_powers(self, bands=BANDS, n=None):
+        '''
+        -> (n_epochs, n_bands) mean power per epoch in each band, from the cached spectra
+        '''
+        n = self.n_epochs if n is None else n
+        powers = np.empty((n, len(bands)))
+        for j, (lo, hi) in enumerate(bands.values()):
+            powers[:, j] = self.psd[:n, :, find_nearest(self.freqs, lo):find_nearest(self.freqs, hi)].mean(axis=(1, 2))
+        return powers
+
+    def erp(self, event_id):
+        '''
+        -> (n_channels, n_times) average of the event's epochs so far, in V (None before the first one)
+        '''
+        if event_id not in self.erp_sums:
+            return None
+        total, count = self.erp_sums[event_id]
+        return total / count
+
+    def thetas(self, epochs=None):
+        '''
+        -> {event id: mean theta power} for every condition in the store, separated in one pass
+        epochs: as in select, applied within each condition
+        '''
+        n = self.n_epochs
+        event_ids, inverse = np.unique(self.event_ids[:n], return_inverse=True)
+        if epochs is not None:
+            return {int(event_id): self.theta(event_id, epochs) for event_id in event_ids}
+        sums = np.bincount(inverse, weights=self.band_power[:n], minlength=len(event_ids))
+        counts = np.bincount(inverse, minlength=len(event_ids))
+        return dict(zip(event_ids.astype(int).tolist(), (sums / counts).tolist()))
+
+    def theta(self, event_id=None, epochs=None):
+        '''
+        -> mean theta power over the selected epochs (0 if there are none yet)
+        '''
+        idx = self.select(event_id, epochs)
+        if len(idx) == 0:
+            return 0
+        return self.band_power[idx].mean()
+
+
+def epoch_view(data, starts, n_times):
+    '''
+    (n_channels, n_samples) + epoch start samples -> (n_epochs, n_channels, n_times),
+    gathered from a strided window view rather than sliced epoch by epoch
+    '''
+    windows = sliding_window_view(data, n_times, axis=1)  # (n_channels, n_samples - n_times + 1, n_times)
+    return windows[:, starts].transpose(1, 0, 2)
+
+
+def epoch_psd(epochs, sampling_rate, n_pre):
+    '''
+    (n_epochs, n_channels, n_times) -> baselined epochs, freqs, psd
+    Matches mne.Epochs (baseline (None, 0)) followed by compute_psd(method='welch').
+    '''
+    epochs = epochs - epochs[..., :n_pre + 1].mean(axis=-1, keepdims=True)
+    freqs, psd = signal.welch(epochs, sampling_rate, window='hamming', nperseg=min(2048, epochs.shape[-1]),
+                              noverlap=0, detrend='constant')
+    return epochs, freqs, psd
+
+
+def band_power(data, onsets, sampling_rate, tmin=TMIN, tmax=TMAX, band=THETA_BAND):
+    '''
+    (n_channels, n_samples) in V + event onset samples -> mean band power over all epochs
+    Lean equivalent of result.theta_power: no mne objects, one Welch call for every epoch.
+    '''
+    n_pre = int(round(-tmin * sampling_rate))
+    n_post = int(round(tmax * sampling_rate))
+    onsets = np.asarray(onsets, dtype=int)
+    onsets = onsets[(onsets >= n_pre) & (onsets + n_post < data.shape[1])]  # as mne, drop clipped epochs
+    if len(onsets) == 0:
+        return 0
+    _, freqs, psd = epoch_psd(epoch_view(data, onsets - n_pre, n_pre + n_post + 1), sampling_rate, n_pre)
+    return psd[:, :, find_nearest(freqs, band[0]):find_nearest(freqs, band[1])].mean()
+
+
+def find_nearest(array, value):
+    array = np.asarray(array)
+    idx = (np.abs(array - value)).argmin()
+    return idx
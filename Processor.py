@@ -1,10 +1,15 @@
 from Board import Board
 from brainflow.board_shim import BoardShim, BrainFlowInputParams, BrainFlowError
+from brainflow.data_filter import DataFilter, FilterTypes
 import numpy as np
 
 class Processor(Board):
-    def __init__(self, board_id, params, channels=None):
+    def __init__(self, board_id, params, channels=None, bandstop=(0, 60), bandpass=(90, 330), order=4):
         super().__init__(board_id, params)
+        # Filter settings in Hz; None skips that stage
+        self.bandstop = bandstop
+        self.bandpass = bandpass
+        self.order = order
         self.sampling_rate = BoardShim.get_sampling_rate(self.board_id)
         if channels is None:
             self.channels = BoardShim.get_exg_channels(self.board_id)
@@ -41,12 +46,14 @@ class Processor(Board):
         new_filtered = self.raw_signal.copy()  # include the entire buffer to avoid boundary effects
         for channel in range(len(self.channels)):
             # DataFilter.detrend(data, DetrendOperations.CONSTANT.value)
-            DataFilter.perform_bandstop(new_filtered[channel], self.sampling_rate, 0, 60, 4,
-                                        FilterTypes.BUTTERWORTH, 0)
+            if self.bandstop is not None:
+                DataFilter.perform_bandstop(new_filtered[channel], self.sampling_rate, *self.bandstop, self.order,
+                                            FilterTypes.BUTTERWORTH, 0)
             # DataFilter.perform_lowpass(data, self.sampling_rate, 360, 4,
             #                             FilterTypes.BUTTERWORTH, 0)
-            DataFilter.perform_bandpass(new_filtered[channel], self.sampling_rate, 90, 330, 4,
-                                        FilterTypes.BUTTERWORTH, 0)
+            if self.bandpass is not None:
+                DataFilter.perform_bandpass(new_filtered[channel], self.sampling_rate, *self.bandpass, self.order,
+                                            FilterTypes.BUTTERWORTH, 0)
             # DataFilter.perform_bandpass(new_filtered[channel], self.sampling_rate, 20, 500, 4,
             #                             FilterTypes.BUTTERWORTH, 0)
             # DataFilter.perform_bandpass(new_filtered[channel], self.sampling_rate, 20, 500, 2,
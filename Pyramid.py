@@ -0,0 +1,147 @@
+import os
+import numpy as np
+from brainflow.board_shim import BoardShim, BoardIds
+
+BASE = 16  # samples per level-0 block
+FACTOR = 8  # blocks of one level per block of the next
+LEVELS = 6  # level k blocks cover BASE * FACTOR**k samples: 16 .. 524288
+
+# One record per block, float64: first timestamp, last timestamp, sample count, then min, max and mean per channel
+T_FIRST, T_LAST, COUNT, HEADER = 0, 1, 2, 3
+
+
+def level_path(fname, level):
+    '''
+    recording file name -> file name of one level of its overview pyramid
+    '''
+    root, _ = os.path.splitext(fname)
+    return f"{root}_overview_{level}.f64"
+
+
+def merge(records, n_channels):
+    '''
+    (n_blocks, group, record) -> (n_blocks, record): each group of consecutive blocks merged into one
+    '''
+    lo, hi, mean = HEADER, HEADER + n_channels, HEADER + 2 * n_channels
+    counts = records[:, :, COUNT]
+    merged = np.empty((len(records), records.shape[2]))
+    merged[:, T_FIRST] = records[:, 0, T_FIRST]
+    merged[:, T_LAST] = records[:, -1, T_LAST]
+    merged[:, COUNT] = counts.sum(axis=1)
+    merged[:, lo:hi] = records[:, :, lo:hi].min(axis=1)
+    merged[:, hi:mean] = records[:, :, hi:mean].max(axis=1)
+    merged[:, mean:] = (records[:, :, mean:] * counts[..., None]).sum(axis=1) / merged[:, COUNT, None]
+    return merged
+
+
+# Builds the min/max/mean pyramid of a recording as its samples arrive, appending each level to its own file
+class PyramidWriter:
+    def __init__(self, board_id, fname, channels=None):
+        self.fname = fname
+        self.channels = BoardShim.get_eeg_channels(board_id) if channels is None else channels
+        self.timestamp_channel = BoardShim.get_timestamp_channel(board_id)
+        self.record_size = HEADER + 3 * len(self.channels)
+        self.tail = np.zeros((len(self.channels) + 1, 0))  # timestamp row + channels not yet in a level-0 block
+        self.pending = [np.zeros((0, self.record_size)) for _ in range(LEVELS)]  # blocks not yet merged upwards
+
+    def append(self, data):
+        '''
+        board data (n_rows, n_samples) -> completed blocks appended to the level files
+        '''
+        buf = np.concatenate((self.tail, data[[self.timestamp_channel] + list(self.channels)]), axis=1)
+        n_blocks = buf.shape[1] // BASE
+        self.tail = buf[:, n_blocks * BASE:]
+        if n_blocks:
+            self.add(self.blocks(buf[:, :n_blocks * BASE].reshape(len(buf), n_blocks, BASE)), 0)
+
+    def finish(self):
+        '''
+        flush the partial blocks at the end of the recording, so every level covers all of it
+        '''
+        if self.tail.shape[1]:
+            self.add(self.blocks(self.tail[:, None, :]), 0)
+            self.tail = self.tail[:, :0]
+        for level in range(1, LEVELS):
+            below = self.pending[level - 1]
+            self.pending[level - 1] = below[:0]
+            if len(below):
+                self.add(merge(below[None], len(self.channels)), level)
+
+    def blocks(self, samples):
+        '''
+        (1 + n_channels, n_blocks, block length) -> (n_blocks, record) level-0 records
+        '''
+        n = len(self.channels)
+        records = np.empty((samples.shape[1], self.record_size))
+        records[:, T_FIRST] = samples[0, :, 0]
+        records[:, T_LAST] = samples[0, :, -1]
+        records[:, COUNT] = samples.shape[2]
+        records[:, HEADER:HEADER + n] = samples[1:].min(axis=-1).T
+        records[:, HEADER + n:HEADER + 2 * n] = samples[1:].max(axis=-1).T
+        records[:, HEADER + 2 * n:] = samples[1:].mean(axis=-1).T
+        return records
+
+    def add(self, records, level):
+        self.write(level, records)
+        if level + 1 == LEVELS:
+            return
+        pending = np.concatenate((self.pending[level], records))
+        n_groups = len(pending) // FACTOR
+        self.pending[level] = pending[n_groups * FACTOR:]
+        if n_groups:
+            groups = pending[:n_groups * FACTOR].reshape(n_groups, FACTOR, self.record_size)
+            self.add(merge(groups, len(self.channels)), level + 1)
+
+    def write(self, level, records):
+        with open(level_path(self.fname, level), 'ab') as f:
+            f.write(records.astype('<f8').tobytes())
+
+
+# Reads a recording's pyramid through memory maps: only the blocks of the level and range asked for are touched
+class PyramidReader:
+    def __init__(self, fname, board_id=BoardIds.GANGLION_BOARD, channels=None):
+        self.fname = fname
+        self.n_channels = len(BoardShim.get_eeg_channels(board_id) if channels is None else channels)
+        self.record_size = HEADER + 3 * self.n_channels
+
+    def level(self, level):
+        '''
+        -> (n_blocks, record) memory map of one level (empty if it has no block yet)
+        '''
+        path = level_path(self.fname, level)
+        n_blocks = os.path.getsize(path) // (8 * self.record_size) if os.path.exists(path) else 0
+        if n_blocks == 0:
+            return np.zeros((0, self.record_size))
+        # re-mapped on each call, so blocks written while recording show up
+        return np.memmap(path, dtype='<f8', mode='r', shape=(n_blocks, self.record_size))
+
+    def span(self):
+        '''
+        -> (first, last) timestamp covered so far, or None if there is nothing yet
+        '''
+        blocks = self.level(0)
+        if len(blocks) == 0:
+            return None
+        return blocks[0, T_FIRST], blocks[-1, T_LAST]
+
+    def read(self, t0, t1, max_blocks=2000):
+        '''
+        timestamp range -> (level, t (n,), min (n_channels, n), max, mean) from the finest level that
+        has at most max_blocks blocks in the range
+        '''
+        for level in range(LEVELS):
+            blocks = self.level(level)
+            i0 = np.searchsorted(blocks[:, T_LAST], t0, side='left')  # binary search over block times
+            i1 = np.searchsorted(blocks[:, T_FIRST], t1, side='right')
+            if i1 - i0 <= max_blocks or level + 1 == LEVELS:
+                break
+        return (level,) + self.unpack(blocks[i0:i1])
+
+    def unpack(self, blocks):
+        '''
+        (n, record) blocks -> (t (n,), min (n_channels, n), max, mean), copied out of the map
+        '''
+        n = self.n_channels
+        records = np.array(blocks)
+        return (records[:, T_FIRST], records[:, HEADER:HEADER + n].T,
+                records[:, HEADER + n:HEADER + 2 * n].T, records[:, HEADER + 2 * n:].T)
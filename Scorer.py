@@ -0,0 +1,221 @@
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+
+from lazy_imports import lazy_module
+linear_model = lazy_module('sklearn.linear_model')  # first needed when a model is trained
+preprocessing = lazy_module('sklearn.preprocessing')
+
+from Artifacts import BadSpanIndex, board_detector
+from EpochStore import EpochStore, BANDS, find_nearest
+from Sessions import SESSIONS_DIR, read_catalog, session_file, epoch_file
+
+MODEL_PATH = 'predictor_model.pkl'  # what server.py loads
+
+
+def band_features(psd, freqs, bands=BANDS):
+    '''
+    (n_epochs, n_channels, n_freqs) spectra -> (n_epochs, n_channels * n_bands) log10 band powers
+    Every band of every channel of every epoch in one pass: band means come from a cumulative sum over frequency.
+    '''
+    edges = np.array([(find_nearest(freqs, lo), find_nearest(freqs, hi)) for lo, hi in bands.values()])
+    cumulative = np.concatenate((np.zeros(psd.shape[:-1] + (1,)), np.cumsum(psd, axis=-1)), axis=-1)
+    powers = (cumulative[..., edges[:, 1]] - cumulative[..., edges[:, 0]]) / (edges[:, 1] - edges[:, 0])
+    return np.log10(powers + np.finfo(float).tiny).reshape(len(psd), -1)
+
+
+def features_path(fname):
+    '''
+    recording file name -> file name of its cached epoch features
+    '''
+    root, _ = os.path.splitext(fname)
+    return f"{root}_features.npz"
+
+
+def session_features(entry, bands=BANDS, directory=SESSIONS_DIR):
+    '''
+    catalog entry -> (features, event ids) of the session's clean epochs, cached next to its file
+    '''
+    fname = session_file(entry, directory)
+    cache = features_path(fname)
+    if os.path.exists(cache):
+        cached = np.load(cache)
+        if list(cached['bands']) == list(bands):
+            return cached['features'], cached['event_ids']
+
+    store = EpochStore(int(entry['board_id']), bad_spans=BadSpanIndex())
+    for _ in epoch_file(fname, store):
+        pass
+    n = store.n_epochs
+    features = band_features(store.psd[:n], store.freqs, bands)
+    event_ids = store.event_ids[:n].astype(int)
+    np.savez(cache, features=features, event_ids=event_ids, bands=list(bands))
+    return features, event_ids
+
+
+# Linear classifier over epoch band powers, updated incrementally as sessions are recorded
+class OnlineScorer:
+    def __init__(self, bands=BANDS, classes=None):
+        self.bands = bands
+        # event ids it tells apart; if None, fixed by the first batch with two or more
+        self.classes = None if classes is None else np.asarray(classes)
+        self.scaler = preprocessing.StandardScaler()
+        self.model = linear_model.SGDClassifier(loss='log_loss')  # logistic regression, trained by partial_fit
+        self.board_id = None
+        self.sessions = []  # ids of the sessions trained on
+        self.n_trained = 0  # epochs trained on
+
+    @property
+    def ready(self):
+        return self.n_trained > 0
+
+    def partial_fit(self, features, event_ids):
+        '''
+        (n_epochs, n_features) + their event ids -> model updated; False if the batch could not be used
+        '''
+        if self.classes is None:
+            classes = np.unique(event_ids)
+            if len(classes) < 2:
+                print("[OnlineScorer] Need epochs of at least two conditions to start training.")
+                return False
+            self.classes = classes
+        known = np.isin(event_ids, self.classes)
+        if not known.any():
+            return False
+        features, event_ids = features[known], event_ids[known]
+        self.scaler.partial_fit(features)
+        self.model.partial_fit(self.scaler.transform(features), event_ids, classes=self.classes)
+        self.n_trained += len(features)
+        return True
+
+    def predict_proba(self, features):
+        '''
+        (n_epochs, n_features) -> (n_epochs, n_classes) probability of each event id in self.classes
+        '''
+        return self.model.predict_proba(self.scaler.transform(features))
+
+    def update(self, directory=SESSIONS_DIR):
+        '''
+        train on the catalogued sessions not seen yet -> number of sessions added
+        '''
+        entries = [entry for entry in read_catalog(directory) if entry['session_id'] not in self.sessions]
+        if not entries:
+            return 0
+        # one board only, as boards differ in channels; before the first fit, that of the latest session
+        board_id = int(entries[-1]['board_id']) if self.board_id is None else self.board_id
+        entries = [entry for entry in entries if int(entry['board_id']) == board_id]
+        if not entries:
+            return 0
+        start = time.perf_counter()
+        batches = [session_features(entry, self.bands, directory) for entry in entries]
+        features = np.concatenate([features for features, _ in batches])
+        event_ids = np.concatenate([event_ids for _, event_ids in batches])
+        if not self.partial_fit(features, event_ids):
+            return 0  # kept for the next update, when more conditions may have been recorded
+        self.board_id = board_id
+        self.sessions.extend(entry['session_id'] for entry in entries)
+        print(f"[OnlineScorer] Trained on {len(entries)} new session(s), {len(features)} epochs, "
+              f"in {time.perf_counter() - start:.2f} s.")
+        return len(entries)
+
+    def save(self, path=MODEL_PATH):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(path=MODEL_PATH):
+        '''
+        -> the saved scorer, or None if there is none
+        '''
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            scorer = pickle.load(f)
+        return scorer if isinstance(scorer, OnlineScorer) else None
+
+
+# Epochs the shared live stream and scores each new epoch once; requests are served from the cache
+class LiveScorer:
+    def __init__(self, scorer, reader):
+        self.scorer = scorer
+        self.reader = reader  # SharedStream.SharedStreamReader
+        # screened as in the client, so flagged data is skipped here as it was when training
+        self.artifacts = board_detector(reader.board_id)
+        self.store = EpochStore(reader.board_id, bad_spans=self.artifacts.index)
+        self.position = reader.position  # only epochs from now on
+        self.features = np.empty((0, len(self.store.channels) * len(scorer.bands)))
+        self.probabilities = np.empty((0, len(scorer.classes)))
+        self.lock = threading.Lock()  # one per server, polled by every client handler
+
+    def update(self):
+        '''
+        pull new samples from the stream -> number of newly scored epochs
+        '''
+        with self.lock:
+            if self.reader is None:
+                return 0  # closed; the server attaches a new scorer
+            data, self.position = self.reader.read(since=self.position)
+            self.artifacts.append(data)
+            self.store.append(data)
+            n_scored, n = len(self.probabilities), self.store.n_epochs
+            if n == n_scored:
+                return 0
+            features = band_features(self.store.psd[n_scored:n], self.store.freqs, self.scorer.bands)
+            self.features = np.concatenate((self.features, features))
+            self.probabilities = np.concatenate((self.probabilities, self.scorer.predict_proba(features)))
+            return n - n_scored
+
+    def close(self):
+        with self.lock:  # not while a handler is reading
+            self.reader.close()
+            self.reader = None
+
+    def latest(self):
+        '''
+        -> prediction for the most recent epoch, or None before the first one
+        '''
+        if len(self.probabilities) == 0:
+            return None
+        p = self.probabilities[-1]
+        k = int(np.argmax(p))
+        return {'event_id': int(self.scorer.classes[k]), 'probability': float(p[k]),
+                'n_epochs': len(self.probabilities)}
+
+
+def benchmark(scorer, n_epochs=1000, repeats=10):
+    '''
+    -> (epochs/s through band_features, epochs/s through band_features + predict_proba), all epochs in one batch
+    '''
+    store = EpochStore(scorer.board_id)
+    psd = np.random.default_rng(0).random((n_epochs, len(store.channels), len(store.freqs)))
+    scorer.predict_proba(band_features(psd, store.freqs, scorer.bands))  # warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        band_features(psd, store.freqs, scorer.bands)
+    extracted = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(repeats):
+        scorer.predict_proba(band_features(psd, store.freqs, scorer.bands))
+    scored = time.perf_counter() - start
+    return repeats * n_epochs / extracted, repeats * n_epochs / scored
+
+
+def main():
+    # Update the saved model with every session recorded since the last run
+    from Scorer import OnlineScorer  # pickled as Scorer.OnlineScorer rather than __main__.OnlineScorer
+    scorer = OnlineScorer.load() or OnlineScorer()
+    scorer.update()
+    if not scorer.ready:
+        print("[OnlineScorer] Nothing to train on yet.")
+        return
+    scorer.save()
+    extract_rate, score_rate = benchmark(scorer)
+    print(f"[OnlineScorer] {len(scorer.sessions)} sessions, {scorer.n_trained} epochs, classes {scorer.classes.tolist()}.")
+    print(f"[OnlineScorer] Feature extraction: {extract_rate:,.0f} epochs/s; "
+          f"extraction + scoring: {score_rate:,.0f} epochs/s.")
+
+if __name__ == "__main__":
+    main()
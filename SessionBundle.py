@@ -0,0 +1,94 @@
+import csv
+import io
+import json
+import os
+import zipfile
+
+import numpy as np
+from brainflow.board_shim import BoardShim
+
+from EpochStore import BANDS
+from Sessions import read_chunks
+
+
+def write_bundle(path, fname, board_id, metadata, epoch_store=None, score_history=(), bad_spans_fname=None,
+                 triggers_fname=None, t_range=None, first_sample=None, progress=None):
+    '''
+    recording file + session state -> one compressed archive at path containing
+        signal.f64      raw board rows as little-endian float64, one record of n_rows values per sample
+        markers.csv     sample, timestamp and code of every marker in the signal
+        epochs.csv      onset, event id and band powers of each epoch
+        scores.csv      score timeline
+        bad_spans.csv   artifact spans, if any were flagged
+        triggers.csv    maze trigger ID of each marker code, if the session has a trigger table
+        summary.csv     one-row result summary
+        metadata.json   session metadata plus the layout of signal.f64
+    t_range: (first, last) board timestamps to keep; the whole file if None
+    first_sample: stream sample (as counted by epoch_store) at which the file starts; if given, only
+        epochs inside the recording are kept and their onsets are given in samples of signal.f64
+    progress: optional callback taking a percentage
+    '''
+    marker_channel = BoardShim.get_marker_channel(board_id)
+    timestamp_channel = BoardShim.get_timestamp_channel(board_id)
+    n_samples = 0
+    n_rows = None
+    markers = []
+
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+        # Signal: streamed chunk by chunk straight into the archive, so memory stays flat
+        with bundle.open('signal.f64', 'w', force_zip64=True) as out:
+            for data, done in read_chunks(fname):
+                chunk = data.T  # (n_samples, n_rows)
+                if t_range is not None:
+                    t = chunk[:, timestamp_channel]
+                    chunk = chunk[(t >= t_range[0]) & (t <= t_range[1])]
+                n_rows = chunk.shape[1]
+                idx = np.flatnonzero(chunk[:, marker_channel])
+                markers.extend(zip((n_samples + idx).tolist(), chunk[idx, timestamp_channel].tolist(),
+                                   chunk[idx, marker_channel].tolist()))
+                out.write(chunk.astype('<f8').tobytes())
+                n_samples += len(chunk)
+                if progress is not None:
+                    progress(int(90 * done))
+
+        bundle.writestr('markers.csv', to_csv(['sample', 'timestamp', 'code'], markers))
+
+        if epoch_store is not None:
+            n = epoch_store.n_epochs  # epochs below this are never rewritten, even while recording continues
+            rows = np.column_stack([epoch_store.onsets[:n], epoch_store.event_ids[:n],
+                                    epoch_store.band_powers(BANDS, n)])
+            if first_sample is not None:
+                onsets = rows[:, 0] - first_sample
+                rows = rows[(onsets >= 0) & (onsets < n_samples)]
+                rows[:, 0] -= first_sample
+            bundle.writestr('epochs.csv', to_csv(['onset', 'event_id'] + list(BANDS), rows.tolist()))
+
+        bundle.writestr('scores.csv', to_csv(['elapsed_s', 'score'], score_history))
+        if bad_spans_fname is not None and os.path.exists(bad_spans_fname):
+            bundle.write(bad_spans_fname, 'bad_spans.csv')
+        if triggers_fname is not None and os.path.exists(triggers_fname):
+            bundle.write(triggers_fname, 'triggers.csv')
+
+        bundle.writestr('summary.csv', to_csv(
+            ["Patient Name", "Age", "Result", "Visuospatial Processing Score", "Timestamp"],
+            [[metadata.get('patient_name'), metadata.get('age'), metadata.get('result'),
+              metadata.get('score'), metadata.get('exported_at')]]
+        ))
+        metadata = dict(metadata, board_id=int(board_id), n_rows=n_rows, n_samples=n_samples,
+                        signal_dtype='<f8', signal_layout='sample-major',
+                        sampling_rate=BoardShim.get_sampling_rate(board_id),
+                        eeg_channels=BoardShim.get_eeg_channels(board_id),
+                        marker_channel=marker_channel, timestamp_channel=timestamp_channel)
+        bundle.writestr('metadata.json', json.dumps(metadata, indent=4))
+
+    if progress is not None:
+        progress(100)
+    return path
+
+
+def to_csv(header, rows):
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return text.getvalue()
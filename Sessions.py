@@ -0,0 +1,179 @@
+import csv
+import os
+import threading
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+from brainflow import DataFilter
+from brainflow.board_shim import BoardShim
+
+from Artifacts import BadSpanIndex, bad_spans_path
+from Pyramid import PyramidWriter
+from Triggers import triggers_path
+
+SESSIONS_DIR = 'sessions'
+CHUNK_LINES = 5000  # recording rows parsed per step when streaming a file
+CATALOG_FIELDS = ['session_id', 'file', 'patient_name', 'age', 'board_id', 'start_time', 'end_time',
+                  'duration_s', 'first_sample', 'n_samples', 'n_markers', 'n_bytes']
+
+
+def catalog_path(directory=SESSIONS_DIR):
+    return os.path.join(directory, 'catalog.csv')
+
+
+def read_catalog(directory=SESSIONS_DIR):
+    '''
+    -> list of catalog entries (dicts), oldest first
+    '''
+    if not os.path.exists(catalog_path(directory)):
+        return []
+    with open(catalog_path(directory), newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def find_session(session_id=None, directory=SESSIONS_DIR):
+    '''
+    -> catalog entry for session_id (the latest session if None), or None
+    '''
+    catalog = read_catalog(directory)
+    if session_id is None:
+        return catalog[-1] if catalog else None
+    for entry in catalog:
+        if entry['session_id'] == session_id:
+            return entry
+    return None
+
+
+def session_file(entry, directory=SESSIONS_DIR):
+    return os.path.join(directory, entry['file'])
+
+
+def read_chunks(fname, chunk_lines=CHUNK_LINES):
+    '''
+    recording file -> yields (board data (n_rows, n_samples), fraction of the file read so far)
+    '''
+    total_bytes = max(os.path.getsize(fname), 1)
+    read_bytes = 0
+    with open(fname) as f:
+        while True:
+            lines = list(islice(f, chunk_lines))
+            if not lines:
+                return
+            read_bytes += sum(len(line) for line in lines)
+            yield np.loadtxt(lines, delimiter='\t', ndmin=2).T, read_bytes / total_bytes
+
+
+def epoch_file(fname, store, chunk_lines=CHUNK_LINES):
+    '''
+    recording file -> its clean epochs added to store (an EpochStore whose bad_spans is an empty BadSpanIndex);
+    yields the fraction of the file read after each chunk
+    '''
+    timestamp_channel = BoardShim.get_timestamp_channel(store.board_id)
+    spans = BadSpanIndex.read(bad_spans_path(fname))
+    for data, done in read_chunks(fname, chunk_lines):
+        # spans first, so the store knows this chunk has been screened
+        store.bad_spans.add_times(spans, data[timestamp_channel], store.n_samples)
+        store.append(data)
+        yield done
+    store.bad_spans.n_checked = np.inf  # release epochs waiting on the end of the file
+    store.append(np.zeros((BoardShim.get_num_rows(store.board_id), 0)))
+
+
+# Writes the stream to one file per test and records each test in the catalog
+class SessionRecorder:
+    def __init__(self, board_id, directory=SESSIONS_DIR, bad_spans=None, triggers=None):
+        self.board_id = board_id
+        self.directory = directory
+        self.bad_spans = bad_spans  # Artifacts.BadSpanIndex; flushed next to the session file
+        self.triggers = triggers  # Triggers.TriggerRegistry; its table is saved next to the session file
+        self.marker_channel = BoardShim.get_marker_channel(board_id)
+        self.timestamp_channel = BoardShim.get_timestamp_channel(board_id)
+        self.lock = threading.Lock()  # start/stop come from the GUI, writes from the acquisition thread
+        self.n_stream = 0  # samples seen since acquisition started, recorded or not
+        self.entry = None  # catalog entry of the session being recorded
+        self.pyramid = None  # overview of the session being recorded, written next to its file
+
+    @property
+    def recording(self):
+        return self.entry is not None
+
+    def start(self, patient_name='', age=''):
+        '''
+        -> catalog entry of the new session; samples are written to its file until stop()
+        '''
+        with self.lock:
+            if self.entry is not None:
+                self.finish()
+            os.makedirs(self.directory, exist_ok=True)
+            session_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            self.entry = {
+                'session_id': session_id,
+                'file': f"session_{session_id}.csv",
+                'patient_name': patient_name,
+                'age': age,
+                'board_id': int(self.board_id),
+                'start_time': None,
+                'end_time': None,
+                'first_sample': self.n_stream,
+                'n_samples': 0,
+                'n_markers': 0,
+            }
+            if self.bad_spans is not None:
+                self.bad_spans.n_saved = self.bad_spans.n_closed()  # spans that ended before this test stay out
+            self.pyramid = PyramidWriter(self.board_id, session_file(self.entry, self.directory))
+            print(f"[SessionRecorder] Recording session {session_id}.")
+            return self.entry
+
+    def write(self, data):
+        '''
+        board data (n_rows, n_samples) -> appended to the current session file, if any
+        '''
+        with self.lock:
+            self.n_stream += data.shape[1]
+            if self.entry is None or data.shape[1] == 0:
+                return
+            fname = session_file(self.entry, self.directory)
+            DataFilter.write_file(data, fname, 'a')
+            self.pyramid.append(data)
+            if self.entry['start_time'] is None:
+                self.entry['start_time'] = data[self.timestamp_channel, 0]
+            self.entry['end_time'] = data[self.timestamp_channel, -1]
+            self.entry['n_samples'] += data.shape[1]
+            self.entry['n_markers'] += int(np.count_nonzero(data[self.marker_channel] > 0))
+            if self.bad_spans is not None:
+                self.bad_spans.flush(bad_spans_path(fname))
+
+    def stop(self):
+        '''
+        -> catalog entry of the finished session (None if nothing was recording)
+        '''
+        with self.lock:
+            return self.finish()
+
+    def finish(self):
+        entry, self.entry = self.entry, None
+        if entry is None:
+            return None
+        fname = session_file(entry, self.directory)
+        if self.bad_spans is not None:
+            self.bad_spans.flush(bad_spans_path(fname), final=True)
+        self.pyramid.finish()
+        self.pyramid = None
+        if self.triggers is not None:
+            self.triggers.save(triggers_path(fname))
+        if entry['start_time'] is not None:
+            entry['duration_s'] = round(entry['end_time'] - entry['start_time'], 3)
+        else:
+            entry['duration_s'] = 0
+        entry['n_bytes'] = os.path.getsize(fname) if os.path.exists(fname) else 0
+
+        new_catalog = not os.path.exists(catalog_path(self.directory))
+        with open(catalog_path(self.directory), 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CATALOG_FIELDS)
+            if new_catalog:
+                writer.writeheader()
+            writer.writerow(entry)
+        print(f"[SessionRecorder] Session {entry['session_id']} saved: {entry['n_samples']} samples, "
+              f"{entry['duration_s']} s.")
+        return entry
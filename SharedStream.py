@@ -0,0 +1,214 @@
+import os
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from brainflow.board_shim import BoardShim
+
+SHARED_STREAM_NAME = 'neuronav_eeg'
+
+# Header layout: int64 fields ahead of the (n_rows, capacity) float64 ring
+MAGIC = 0x4E4E5331  # "NNS1"
+HEADER_FIELDS = 8
+H_MAGIC, H_BOARD, H_ROWS, H_CAPACITY, H_SAMPLING_RATE, H_POSITION, H_SEQUENCE, H_OWNER = range(8)
+HEADER_BYTES = HEADER_FIELDS * 8
+READ_ATTEMPTS = 10  # a write takes microseconds; a sequence odd for longer means the writer died mid-write
+RETRY_SECONDS = 0.0005
+
+published = set()  # blocks created by writers in this process
+
+
+def map_stream(shm):
+    '''
+    shared memory block -> (header, ring) arrays backed by it, no copy
+    '''
+    header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+    n_rows, capacity = int(header[H_ROWS]), int(header[H_CAPACITY])
+    ring = np.ndarray((n_rows, capacity), dtype=np.float64, buffer=shm.buf, offset=HEADER_BYTES)
+    return header, ring
+
+
+def process_alive(pid):
+    '''
+    -> whether process pid is still running
+    '''
+    if pid <= 0:
+        return False
+    if sys.platform == 'win32':
+        # os.kill would terminate the process on Windows, so ask for its exit code instead
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        kernel32.CloseHandle(handle)
+        return exit_code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # running under another user
+    return True
+
+
+# Publishes the board stream to a shared-memory ring buffer; there is exactly one writer
+class SharedStreamWriter:
+    def __init__(self, board_id, name=SHARED_STREAM_NAME, seconds=30):
+        n_rows = BoardShim.get_num_rows(board_id)
+        sampling_rate = BoardShim.get_sampling_rate(board_id)
+        capacity = int(seconds * sampling_rate)
+        size = HEADER_BYTES + n_rows * capacity * 8
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            existing = shared_memory.SharedMemory(name=name)
+            owner = int(np.ndarray((1,), dtype=np.int64, buffer=existing.buf, offset=H_OWNER * 8)[0])
+            existing.close()
+            if existing._name in published or process_alive(owner):
+                # another client is publishing: leave its stream alone (see SharedStreamReader on the tracker)
+                if sys.version_info < (3, 13) and existing._name not in published:
+                    resource_tracker.unregister(existing._name, 'shared_memory')
+                raise FileExistsError(f"'{name}' is already published by process {owner}")
+            # left behind by a session that did not shut down cleanly
+            existing.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        header[:] = 0
+        header[H_OWNER] = os.getpid()
+        header[H_BOARD] = int(board_id)
+        header[H_ROWS] = n_rows
+        header[H_CAPACITY] = capacity
+        header[H_SAMPLING_RATE] = sampling_rate
+        header[H_MAGIC] = MAGIC  # last, so readers never see a half-initialised header
+        self.header, self.ring = map_stream(self.shm)
+        self.capacity = capacity
+        published.add(self.shm._name)
+        print(f"[SharedStreamWriter] Publishing '{name}': {n_rows} rows x {capacity} samples.")
+
+    def write(self, data):
+        '''
+        board data (n_rows, n_samples) -> appended to the ring; readers see it once the sequence is even
+        '''
+        n = data.shape[1]
+        if n == 0:
+            return
+        position = int(self.header[H_POSITION])
+        if n > self.capacity:  # only the newest capacity samples can be held
+            position += n - self.capacity
+            data = data[:, -self.capacity:]
+        start = position % self.capacity
+        first = min(data.shape[1], self.capacity - start)
+
+        self.header[H_SEQUENCE] += 1  # odd: write in progress
+        self.ring[:, start:start + first] = data[:, :first]
+        self.ring[:, :data.shape[1] - first] = data[:, first:]
+        self.header[H_POSITION] = position + data.shape[1]
+        self.header[H_SEQUENCE] += 1  # even: consistent again
+
+    def close(self):
+        self.header = self.ring = None  # release the exported buffer before closing
+        published.discard(self.shm._name)
+        self.shm.close()
+        self.shm.unlink()
+
+
+# Attaches to a published stream; any number of readers, in any local process
+class SharedStreamReader:
+    def __init__(self, name=SHARED_STREAM_NAME):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # Python < 3.13 registers attached blocks for cleanup and would unlink the writer's block when
+        # this process exits; the writer owns it
+        if sys.version_info < (3, 13) and self.shm._name not in published:
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        self.header, self.ring = map_stream(self.shm)
+        if self.header[H_MAGIC] != MAGIC:
+            raise ValueError(f"'{name}' is not a NeuroNavScore stream")
+        self.board_id = int(self.header[H_BOARD])
+        self.sampling_rate = int(self.header[H_SAMPLING_RATE])
+        self.capacity = int(self.header[H_CAPACITY])
+        self.last_position = self.position
+        self.last_advance = time.monotonic()
+
+    @property
+    def position(self):
+        '''
+        total number of samples published so far
+        '''
+        return int(self.header[H_POSITION])
+
+    @property
+    def buffer(self):
+        '''
+        the ring itself (n_rows, capacity), zero-copy; sample p lives in column p % capacity
+        Check sequence() before and after using it to make sure no write happened meanwhile.
+        '''
+        return self.ring
+
+    def sequence(self):
+        return int(self.header[H_SEQUENCE])
+
+    def stalled(self, seconds=3.0):
+        '''
+        -> True once nothing has been published for that long, e.g. because the writer closed the stream
+        A closed stream stays readable through this mapping; attach again to follow a restarted writer.
+        '''
+        if not process_alive(int(self.header[H_OWNER])):
+            return True  # the writer is gone, even if it left the block behind
+        position, now = self.position, time.monotonic()
+        if position != self.last_position:
+            self.last_position, self.last_advance = position, now
+        return now - self.last_advance > seconds
+
+    def read(self, since=None, max_samples=None):
+        '''
+        -> (board data (n_rows, n) published after position since, new position)
+        With since=None returns everything still in the ring. Samples that were already overwritten are skipped.
+        Returns no samples if no consistent copy could be taken within READ_ATTEMPTS tries.
+        '''
+        for attempt in range(READ_ATTEMPTS):
+            if attempt:
+                time.sleep(RETRY_SECONDS)
+            sequence = self.sequence()
+            if sequence % 2:
+                continue  # writer is mid-update
+            position = self.position
+            start = max(position - self.capacity, 0 if since is None else since)
+            if max_samples is not None:
+                start = max(start, position - max_samples)
+            idx = np.arange(start, position) % self.capacity
+            data = self.ring[:, idx]  # fancy indexing copies, so the result is ours to keep
+            if self.sequence() == sequence:
+                return data, position
+        return np.zeros((self.ring.shape[0], 0)), self.position if since is None else since
+
+    def latest(self, n):
+        '''
+        -> the newest n samples (fewer if not published yet)
+        '''
+        return self.read(max_samples=n)[0]
+
+    def close(self):
+        self.header = self.ring = None
+        self.shm.close()
+
+
+def main():
+    # Minimal consumer: report the rate and latest value of the published stream
+    reader = SharedStreamReader()
+    eeg_channels = BoardShim.get_eeg_channels(reader.board_id)
+    position = reader.position
+    try:
+        while True:
+            time.sleep(1)
+            data, position = reader.read(since=position)
+            if data.shape[1]:
+                print(f"{data.shape[1]} samples/s, latest EEG: {np.round(data[eeg_channels, -1], 1)}")
+    except KeyboardInterrupt:
+        reader.close()
+
+if __name__ == "__main__":
+    main()
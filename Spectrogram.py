@@ -0,0 +1,48 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# Short-time Fourier transform over a stream: only the columns completed by new samples are computed
+class StreamingSTFT:
+    def __init__(self, sampling_rate, n_channels, nfft=None, hop=None, n_columns=200, fmax=40):
+        self.sampling_rate = sampling_rate
+        # ~1 s window (power of two) and 1/8 window hop unless told otherwise
+        self.nfft = nfft if nfft else 1 << int(np.ceil(np.log2(sampling_rate)))
+        self.hop = hop if hop else self.nfft // 8
+        self.window = np.hanning(self.nfft)
+        self.norm = 1 / (sampling_rate * np.sum(self.window ** 2))  # -> power spectral density
+
+        freqs = np.fft.rfftfreq(self.nfft, 1 / sampling_rate)
+        self.n_freqs = int(np.searchsorted(freqs, fmax, side='right'))
+        self.freqs = freqs[:self.n_freqs]
+        self.fmax = self.freqs[-1]
+
+        self.n_columns = n_columns
+        self.span = n_columns * self.hop / sampling_rate  # seconds covered by the image
+        # (time, frequency) in dB, oldest column first; NaN until the first columns arrive
+        self.image = np.full((n_columns, self.n_freqs), np.nan)
+        self.tail = np.zeros((n_channels, 0))  # samples not yet consumed by a full hop
+
+    def reset(self):
+        self.image[:] = np.nan
+        self.tail = np.zeros((self.tail.shape[0], 0))
+
+    def update(self, samples):
+        '''
+        new samples (n_channels, n) -> number of new columns scrolled into self.image
+        '''
+        buf = np.concatenate((self.tail, samples), axis=1)
+        if buf.shape[1] < self.nfft:
+            self.tail = buf
+            return 0
+        n_new = (buf.shape[1] - self.nfft) // self.hop + 1
+        frames = sliding_window_view(buf, self.nfft, axis=1)[:, :(n_new - 1) * self.hop + 1:self.hop]
+        frames = frames - frames.mean(axis=-1, keepdims=True)  # (n_channels, n_new, nfft)
+        spectrum = np.fft.rfft(frames * self.window, axis=-1)[..., :self.n_freqs]
+        power = (np.abs(spectrum) ** 2).mean(axis=0) * self.norm  # average over channels
+        self.tail = buf[:, n_new * self.hop:]
+
+        k = min(n_new, self.n_columns)
+        self.image[:-k] = self.image[k:]  # scroll in place
+        self.image[-k:] = 10 * np.log10(power[-k:] + np.finfo(float).tiny)
+        return n_new
@@ -0,0 +1,70 @@
+import csv
+import os
+import re
+
+TRIGGER_PATTERN = re.compile(r'T(\d+)$')  # the maze numbers its EEG triggers T1, T2, ...
+FIRST_FREE_CODE = 1000  # codes handed out to IDs outside that scheme
+CONDITIONS = {1: 'Easy'}  # analysis labels of known marker codes
+
+
+def triggers_path(fname):
+    '''
+    recording file name -> file name of the trigger table used while recording it
+    '''
+    root, _ = os.path.splitext(fname)
+    return f"{root}_triggers.csv"
+
+
+# Maze trigger IDs <-> positive marker codes written to the board's marker channel
+class TriggerRegistry:
+    def __init__(self, table=None):
+        self.codes = {}  # trigger ID -> marker code: the lookup table every maze message goes through
+        self.ids = {}  # marker code -> trigger ID
+        for trigger_id, code in (table or {}).items():
+            self.register(trigger_id, code)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def register(self, trigger_id, code):
+        self.codes[trigger_id] = int(code)
+        self.ids.setdefault(int(code), trigger_id)
+
+    def code(self, trigger_id):
+        '''
+        trigger ID from the maze -> marker code; IDs seen for the first time are registered
+        '''
+        trigger_id = str(trigger_id)  # the maze may send numbers; saved tables hold strings anyway
+        code = self.codes.get(trigger_id)
+        if code is None:
+            match = TRIGGER_PATTERN.match(trigger_id)
+            if match and int(match.group(1)) > 0:
+                code = int(match.group(1))
+            else:
+                code = max([FIRST_FREE_CODE - 1] + list(self.ids)) + 1
+            self.register(trigger_id, code)
+            print(f"[TriggerRegistry] {trigger_id} -> marker {code}.")
+        return code
+
+    def name(self, code):
+        '''
+        marker code -> label for plots and tables
+        '''
+        code = int(code)
+        return CONDITIONS.get(code) or self.ids.get(code) or f"Event {code}"
+
+    def save(self, fname):
+        with open(fname, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['trigger_id', 'code'])
+            writer.writerows(self.codes.items())
+
+    @classmethod
+    def load(cls, fname):
+        '''
+        -> registry saved in fname (empty if there is none)
+        '''
+        if not os.path.exists(fname):
+            return cls()
+        with open(fname, newline='') as f:
+            return cls({row['trigger_id']: int(row['code']) for row in csv.DictReader(f)})
@@ -1,49 +1,72 @@
 import sys
 import time
 import json
-import csv
 import socket
 from datetime import datetime
 from collections import deque
-import numpy as np
 
+from lazy_imports import timed_import, lazy_module, preload, report_import_times
+np = timed_import('numpy')
+timed_import('PySide6.QtWidgets')
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget,
     QTextEdit, QLabel, QHBoxLayout, QLineEdit, QMessageBox, QFormLayout,
     QGroupBox, QFileDialog, QProgressBar, QSpinBox
 )
 from PySide6.QtCore import QThread, Signal, Slot, QObject, QTimer, Qt
-import pyqtgraph as pg
+pg = timed_import('pyqtgraph')
 
+timed_import('brainflow')
 from brainflow.board_shim import BoardShim, BrainFlowInputParams, BoardIds
-from brainflow import DataFilter
 from brainflow.data_filter import DetrendOperations, FilterTypes, NoiseTypes
 
-TESTING = False
+from Artifacts import board_detector, bad_spans_path
+from Board import Board
+from EpochStore import EpochStore
+from SessionBundle import write_bundle
+from Sessions import SessionRecorder, session_file
+from SharedStream import SharedStreamWriter
+from Spectrogram import StreamingSTFT
+from Triggers import TriggerRegistry, triggers_path
+result = lazy_module('result')  # pulls in mne, only needed once results are viewed
+overview = lazy_module('overview')
+
+MAX_MESSAGE = 65536  # unparseable maze input longer than this is dropped instead of buffered
+# Montages with at least this many channels are drawn as one stacked curve
+STACKED_CHANNEL_THRESHOLD = 16
+# Extra samples kept at the front of the buffer so the plotted window has no filter edge
+GRAPH_MARGIN = 200
+
 # Define the DataAcquisitionThread to handle BrainFlow data
 class DataAcquisitionThread(QThread):
     eeg_data_signal = Signal(tuple)  # Emit EEG data list
+    status_signal = Signal(str)  # Emit board connection status
 
-    def __init__(self, board_id=BoardIds.SYNTHETIC_BOARD, params=None):
+    def __init__(self, board_id=BoardIds.SYNTHETIC_BOARD, params=None, epoch_store=None, artifacts=None,
+                 recorder=None, publisher=None):
         super().__init__()
         self.board_id = board_id
+        self.epoch_store = epoch_store  # marker-locked epochs are cut as the data arrives
+        self.artifacts = artifacts  # screens each segment before it can be epoched
+        self.recorder = recorder  # writes the stream to the current test's session file
+        self.publisher = publisher  # shares the raw stream with other local processes
 
         self.params = params if params else BrainFlowInputParams()
-        self.board = None
+        # Board retries with bounded backoff and reconnects on failed or stalled reads
+        self.board = Board(self.board_id, self.params, on_status=self.status_signal.emit)
         self.is_running = True
         self.eeg_channels = BoardShim.get_eeg_channels(board_id)
 
     def run(self):
         try:
             # Initialize the board
-            self.board = BoardShim(self.board_id, self.params)
-            self.board.prepare_session()
-            self.board.start_stream()
+            if not self.board.start_session():
+                return
             print("[DataAcquisitionThread] Board session started.")
 
             while self.is_running:
                 # Get data from the board
-                data = self.board.get_board_data()
+                data = self.board.get_data()
                 if data.size > 0:
                     # Assuming the first row contains the latest data for channel 1
                     # Adjust indexing based on your specific board and channel setup
@@ -52,8 +75,16 @@ class DataAcquisitionThread(QThread):
                     packet = (latest_eeg, t)
                     self.eeg_data_signal.emit(packet)
 
-                    # Save data to a file
-                    DataFilter.write_file(data, 'eeg_data.csv', 'a')
+                    if self.publisher is not None:
+                        self.publisher.write(data)
+
+                    if self.artifacts is not None:
+                        self.artifacts.append(data)
+                    # Save data to the session file while a test is running
+                    if self.recorder is not None:
+                        self.recorder.write(data)
+                    if self.epoch_store is not None:
+                        self.epoch_store.append(data)
                 time.sleep(0.05)  # Adjust the sleep time as needed
 
         except Exception as e:
@@ -63,12 +94,55 @@ class DataAcquisitionThread(QThread):
 
     def stop(self):
         self.is_running = False
-        if self.board and self.board.is_prepared():
-            self.board.stop_stream()
-            self.board.release_session()
-            print("[DataAcquisitionThread] Board session released.")
+        self.board.stop_event.set()  # interrupt any pending reconnect backoff
         self.quit()
         self.wait()
+        self.board.stop_session()
+        print("[DataAcquisitionThread] Board session released.")
+
+def next_message(buffer, error, decoder):
+    '''
+    -> index of the first '{' from the decoding error on that starts a complete message, or -1 if none has arrived
+    The message that failed before it can no longer be completed by more data: it is malformed.
+    '''
+    if error.msg.startswith('Unterminated string'):
+        return -1  # everything after the error is still inside that string
+    start = buffer.find('{', max(error.pos, 1))
+    while start != -1:
+        try:
+            decoder.raw_decode(buffer, start)
+            return start
+        except json.JSONDecodeError:
+            start = buffer.find('{', start + 1)
+    return -1
+
+
+def parse_messages(buffer, decoder=json.JSONDecoder()):
+    '''
+    received text -> (JSON messages it completes, unparsed remainder)
+    TCP does not keep message boundaries: one recv may hold several messages or part of one.
+    '''
+    messages = []
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            return messages, buffer
+        try:
+            message, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError as e:
+            start = next_message(buffer, e, decoder)
+            if start == -1 and buffer[0] == '{' and len(buffer) < MAX_MESSAGE:
+                return messages, buffer  # the rest of this message has not arrived yet
+            print("[MazeDataReceiverThread] Received malformed JSON.")
+            if start == -1:
+                start = buffer.find('{', 1)
+            if start == -1:
+                return messages, ''
+            buffer = buffer[start:]
+            continue
+        messages.append(message)
+        buffer = buffer[end:]
+
 
 # Define the MazeDataReceiverThread to handle incoming maze data
 class MazeDataReceiverThread(QThread):
@@ -83,11 +157,6 @@ class MazeDataReceiverThread(QThread):
         self.is_running = True
 
     def run(self):
-        if TESTING:
-            while True:
-                time.sleep(5)
-                data = {"triggerID": "T3"}
-                self.maze_data_signal.emit(data)
         try:
             # Set up the server socket
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -101,6 +170,7 @@ class MazeDataReceiverThread(QThread):
                     self.client_socket, addr = self.server_socket.accept()
                     print(f"[MazeDataReceiverThread] Connected by {addr}")
                     self.client_socket.settimeout(1.0)
+                    buffer = ''
                 except socket.timeout:
                     continue  # Check if still running
                 except OSError as e:
@@ -118,14 +188,11 @@ class MazeDataReceiverThread(QThread):
                             break
                         
                         #draw line in data
-                        try:
-                            # Parse as JSON if applicable
-                            json_data = json.loads(data)
+                        messages, buffer = parse_messages(buffer + data)
+                        for json_data in messages:
                             print(f"[MazeDataReceiverThread] Parsed trigger JSON: {json_data}")
-                            print(type(json_data))  # should be a dictionary
-                            self.maze_data_signal.emit(json_data)
-                        except json.JSONDecodeError:
-                            print("[MazeDataReceiverThread] Received malformed JSON.")
+                            if isinstance(json_data, dict):
+                                self.maze_data_signal.emit(json_data)
                     except socket.timeout:
                         continue  # Check if still running
                     except ConnectionResetError:
@@ -171,9 +238,29 @@ class MazeDataReceiverThread(QThread):
         self.wait()
         print("[MazeDataReceiverThread] Thread stopped.")
 
+# Define the ExportThread to package a session without blocking the GUI
+class ExportThread(QThread):
+    progress_signal = Signal(int)  # Emit percentage done
+    finished_signal = Signal(str, str)  # Emit file path and error message ('' on success)
+
+    def __init__(self, file_path, *args, **kwargs):
+        super().__init__()
+        self.file_path = file_path
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        try:
+            write_bundle(self.file_path, *self.args, progress=self.progress_signal.emit, **self.kwargs)
+            self.finished_signal.emit(self.file_path, '')
+        except Exception as e:
+            print(f"[ExportThread] Exception: {e}")
+            self.finished_signal.emit(self.file_path, str(e))
+
 # Define the main ClientWindow
 class ClientWindow(QMainWindow):
-    def __init__(self, board_id=BoardIds.SYNTHETIC_BOARD, params=None, maze_host='localhost', maze_port=65432):
+    def __init__(self, board_id=BoardIds.SYNTHETIC_BOARD, params=None, maze_host='localhost', maze_port=65432,
+                 n_channels=None, stacked=None):
         super().__init__()
         print("[ClientWindow] Initializing ClientWindow.")
         self.setWindowTitle("NeuroNavScore Client Application")
@@ -183,19 +270,40 @@ class ClientWindow(QMainWindow):
         self.test_running = False
         self.test_paused = False
         self.test_start_time = None
+        self.test_end_time = None
         self.test_duration = 10  # default duration in seconds
         self.elapsed_time = 0
         self.pass_fail_result = None
         self.score = 0
+        self.score_history = []  # (elapsed seconds, score), one entry per test second
+        self.export_thread = None
 
         # Initialize Data Structures
-        self.eeg_channels = 4
+        # Size everything from the board descriptor unless a smaller montage is requested
         self.board_id = board_id
+        board_channels = len(BoardShim.get_eeg_channels(self.board_id))
+        self.eeg_channels = board_channels if n_channels is None else min(n_channels, board_channels)
+        self.stacked = self.eeg_channels >= STACKED_CHANNEL_THRESHOLD if stacked is None else stacked
         graph_window_seconds = 5
-        buffer_size = graph_window_seconds * BoardShim.get_sampling_rate(self.board_id) + 200
+        buffer_size = graph_window_seconds * BoardShim.get_sampling_rate(self.board_id) + GRAPH_MARGIN
         self.eeg_data = np.zeros((self.eeg_channels, buffer_size))
         self.t = np.zeros(buffer_size)
         self.ticks = {}
+        self.spectrogram_ticks = {}
+        self.stft = StreamingSTFT(BoardShim.get_sampling_rate(self.board_id), self.eeg_channels)
+        self.artifacts = board_detector(self.board_id)
+        self.epoch_store = EpochStore(self.board_id, bad_spans=self.artifacts.index)
+        self.triggers = TriggerRegistry()  # maze trigger IDs -> marker codes, saved with each session
+        self.recorder = SessionRecorder(self.board_id, bad_spans=self.artifacts.index, triggers=self.triggers)
+        self.session = None  # catalog entry of the last finished test
+        self.results_window = None
+        self.overview_window = None
+        # Scorer, server model etc. read the live stream from shared memory instead of opening the board again
+        try:
+            self.publisher = SharedStreamWriter(self.board_id)
+        except OSError as e:
+            print(f"[ClientWindow] Stream not shared: {e}")
+            self.publisher = None
 
         # Initialize UI
         self.init_ui()
@@ -249,13 +357,35 @@ class ClientWindow(QMainWindow):
         self.eeg_graph.hideAxis("bottom")
 
         self.curves = []
-        self.colors = ['r', 'g', 'b', 'c', 'm', 'y', 'w', 'k']
-
-        for i in range(self.eeg_channels):
-            curve = self.eeg_graph.plot(pen=pg.mkPen(self.colors[i], width=1), name=f"Channel {i+1}")
-            self.curves.append(curve)
-
-        eeg_layout.addWidget(self.eeg_graph)
+        self.colors = [pg.intColor(i, hues=max(self.eeg_channels, 8)) for i in range(self.eeg_channels)]
+        self.create_curves()
+
+        # Time-frequency view (channel-averaged power, scrolled in as new STFT columns complete)
+        self.spectrogram_graph = pg.PlotWidget(title="Time-Frequency (dB)")
+        self.spectrogram_graph.setMouseEnabled(x=False, y=False)
+        self.spectrogram_graph.setLabel('left', "Frequency", units="Hz")
+        self.spectrogram_graph.hideAxis("bottom")
+        self.spectrogram_item = pg.ImageItem(axisOrder='col-major')  # image set once columns exist
+        self.spectrogram_item.setColorMap(pg.colormap.get('viridis'))
+        self.spectrogram_graph.addItem(self.spectrogram_item)
+        for f in (4, 8):  # theta band edges
+            self.spectrogram_graph.addLine(y=f, pen=pg.mkPen('w', width=1, style=Qt.DashLine))
+
+        # Event-locked average per trigger type (channel mean), redrawn as each epoch completes
+        self.erp_graph = pg.PlotWidget(title="Event-Locked Average")
+        self.erp_graph.setMouseEnabled(x=False, y=False)
+        self.erp_graph.setLabel('left', "Amplitude", units="V")
+        self.erp_graph.setLabel('bottom', "Time", units="s")
+        self.erp_graph.addLegend()
+        self.erp_graph.addLine(x=0, pen=pg.mkPen('r', width=1, style=Qt.DashLine))
+        self.erp_curves = {}  # event id -> curve
+        self.erp_state = None  # (clears, epochs) of the store when the averages were last drawn
+
+        graphs_layout = QHBoxLayout()
+        graphs_layout.addWidget(self.eeg_graph, 2)
+        graphs_layout.addWidget(self.spectrogram_graph, 1)
+        graphs_layout.addWidget(self.erp_graph, 1)
+        eeg_layout.addLayout(graphs_layout)
         eeg_group.setLayout(eeg_layout)
 
         # Test Controls Group
@@ -324,7 +454,19 @@ class ClientWindow(QMainWindow):
         self.export_button.setStyleSheet("font-size: 14px; padding: 8px;")
         self.export_button.clicked.connect(self.export_results)
         self.export_button.setEnabled(False)
-        self.export_button.setToolTip("Click to export test results as a CSV file.")
+        self.export_button.setToolTip("Click to export the test session as a compressed bundle.")
+
+        # Theta Results Button
+        self.results_button = QPushButton("Theta Results")
+        self.results_button.setStyleSheet("font-size: 14px; padding: 8px;")
+        self.results_button.clicked.connect(self.show_results)
+        self.results_button.setToolTip("Click to view theta power for the epochs recorded so far.")
+
+        # Session Overview Button
+        self.overview_button = QPushButton("Session Overview")
+        self.overview_button.setStyleSheet("font-size: 14px; padding: 8px;")
+        self.overview_button.clicked.connect(self.show_overview)
+        self.overview_button.setToolTip("Click to browse the whole current or last session.")
 
         # Assemble Main Layout
         main_layout.addWidget(title_label)
@@ -335,19 +477,61 @@ class ClientWindow(QMainWindow):
         main_layout.addWidget(self.progress_bar)
         main_layout.addWidget(performance_group)
         main_layout.addWidget(self.export_button)
+        main_layout.addWidget(self.results_button)
+        main_layout.addWidget(self.overview_button)
 
         # Set Main Layout
         container = QWidget()
         container.setLayout(main_layout)
         self.setCentralWidget(container)
 
+    def create_curves(self):
+        '''
+        (re)build the EEG plot items for the current channel count
+        '''
+        self.eeg_graph.clear()
+        self.curves = []
+        if not self.stacked:
+            for i in range(self.eeg_channels):
+                curve = self.eeg_graph.plot(pen=pg.mkPen(self.colors[i], width=1), name=f"Channel {i+1}")
+                self.curves.append(curve)
+            return
+
+        # One PlotCurveItem for the whole montage: channels are laid end to end and
+        # the connect array breaks the line between them, so it is a single draw call
+        window = self.eeg_data.shape[1] - GRAPH_MARGIN
+        self.stacked_x = np.empty((self.eeg_channels, window))
+        self.stacked_y = np.empty((self.eeg_channels, window))
+        self.stacked_offsets = np.arange(self.eeg_channels)[:, None]
+        self.stacked_connect = np.ones(self.eeg_channels * window, dtype=bool)
+        self.stacked_connect[window - 1::window] = False
+        self.stacked_curve = pg.PlotCurveItem(pen=pg.mkPen('w', width=1))
+        self.eeg_graph.addItem(self.stacked_curve)
+        self.curves.append(self.stacked_curve)
+        self.eeg_graph.getAxis('left').setTicks(
+            [[(i, f"Ch {i+1}") for i in range(self.eeg_channels)]]
+        )
+
     def init_data_acquisition(self, board_id, params):
         print("[ClientWindow] Initializing data acquisition thread.")
-        self.data_thread = DataAcquisitionThread(board_id=board_id, params=params)
+        self.data_thread = DataAcquisitionThread(board_id=board_id, params=params, epoch_store=self.epoch_store,
+                                                 artifacts=self.artifacts, recorder=self.recorder,
+                                                 publisher=self.publisher)
         self.data_thread.eeg_data_signal.connect(self.update_eeg_data)
+        self.data_thread.status_signal.connect(self.update_connection_status)
         self.data_thread.start()
-        self.status_label.setText("Connection Status: EEG Connected")
-        self.status_label.setStyleSheet("font-weight: bold; color: green;")
+
+    @Slot(str)
+    def update_connection_status(self, status):
+        if status == 'connected':
+            self.status_label.setText("Connection Status: EEG Connected")
+            self.status_label.setStyleSheet("font-weight: bold; color: green;")
+        elif status == 'reconnecting':
+            self.status_label.setText("Connection Status: Reconnecting...")
+            self.status_label.setStyleSheet("font-weight: bold; color: orange;")
+        else:
+            self.status_label.setText("Connection Status: Disconnected")
+            self.status_label.setStyleSheet("font-weight: bold; color: red;")
 
     def init_maze_data_receiver(self, host, port):
         print("[ClientWindow] Initializing maze data receiver thread.")
@@ -358,30 +542,36 @@ class ClientWindow(QMainWindow):
     @Slot(list)
     def update_eeg_data(self, data):
         eeg_data, t = data
+        n = min(len(t), self.t.shape[0])
         # Update the t
-        self.t = np.roll(self.t, -len(t), 0)
-        self.t[-len(t):] = t
-        # Update the EEG data queues
-        for i in range(self.eeg_channels):
-            self.eeg_data[i] = np.roll(self.eeg_data[i], -len(eeg_data[i]), 0)
-            self.eeg_data[i, -len(eeg_data[i]):] = eeg_data[i]
+        self.t = np.roll(self.t, -n, 0)
+        self.t[-n:] = t[-n:]
+        # Update the EEG data queues (the board may report more channels than we display)
+        self.eeg_data = np.roll(self.eeg_data, -n, 1)
+        self.eeg_data[:, -n:] = eeg_data[:self.eeg_channels, -n:]
 
         sr = BoardShim.get_sampling_rate(self.board_id)
         # Update the EEG graphs
-        for i, curve in enumerate(self.curves):
-            data = self.eeg_data[i].copy()
-            # DataFilter.remove_environmental_noise(data, sr, NoiseTypes.SIXTY.value)
-            # DataFilter.detrend(data, DetrendOperations.CONSTANT.value)
-            # DataFilter.perform_bandpass(data, sr, 4, 8, 4, FilterTypes.BUTTERWORTH, 0)
-            curve.setData(x=self.t[200:], y=data[200:])
-        
+        if self.stacked:
+            self.update_stacked_curve()
+        else:
+            for i, curve in enumerate(self.curves):
+                data = self.eeg_data[i].copy()
+                # DataFilter.remove_environmental_noise(data, sr, NoiseTypes.SIXTY.value)
+                # DataFilter.detrend(data, DetrendOperations.CONSTANT.value)
+                # DataFilter.perform_bandpass(data, sr, 4, 8, 4, FilterTypes.BUTTERWORTH, 0)
+                curve.setData(x=self.t[GRAPH_MARGIN:], y=data[GRAPH_MARGIN:])
+
         # Update the ticks
         for tick in self.ticks.keys():
-            if tick < self.t[200] and self.ticks[tick] is not None:
+            if tick < self.t[GRAPH_MARGIN] and self.ticks[tick] is not None:
                 self.eeg_graph.removeItem(self.ticks[tick])  # delete the inf line
             if tick <= self.t[-1] and self.ticks[tick] is None:
                 self.ticks[tick] = self.eeg_graph.addLine(x=tick, pen=pg.mkPen('r', width=5))
                 self.ticks[tick].setZValue(20)
+
+        self.update_spectrogram(eeg_data[:self.eeg_channels, -n:])
+        self.update_erp()
         # Update the visuospatial processing score
         # Replace this with your actual scoring logic
         # eeg_sum = sum(abs(val) for val in eeg_data)
@@ -389,6 +579,65 @@ class ClientWindow(QMainWindow):
         # self.score_label.setText(f"Visuospatial Processing Score: {self.score} - N/A")
         # print(f"[ClientWindow] Updated Score: {self.score}")
 
+    def update_stacked_curve(self):
+        '''
+        eeg_data -> one stacked curve, each channel scaled to unit height around its row
+        '''
+        window = self.eeg_data[:, GRAPH_MARGIN:]
+        self.stacked_x[:] = self.t[GRAPH_MARGIN:]
+        np.subtract(window, window.mean(axis=1, keepdims=True), out=self.stacked_y)
+        scale = np.abs(self.stacked_y).max(axis=1, keepdims=True)
+        scale[scale == 0] = 1
+        self.stacked_y /= 2.2 * scale
+        self.stacked_y += self.stacked_offsets
+        self.stacked_curve.setData(x=self.stacked_x.ravel(), y=self.stacked_y.ravel(),
+                                   connect=self.stacked_connect)
+
+    def update_spectrogram(self, new_samples):
+        '''
+        new samples -> new STFT columns scrolled into the image; nothing is redrawn if no column completed
+        '''
+        if self.stft.update(new_samples) == 0:
+            return
+        image = self.stft.image
+        finite = image[np.isfinite(image[:, 0])]
+        if len(finite) == 0:
+            return
+        self.spectrogram_item.setImage(image, autoLevels=False,
+                                       levels=np.percentile(finite, (5, 99)))
+        # Right edge tracks the newest sample so triggers line up with the EEG trace
+        self.spectrogram_item.setRect(self.t[-1] - self.stft.span, 0, self.stft.span, self.stft.fmax)
+        for tick in self.ticks.keys():
+            line = self.spectrogram_ticks.get(tick)
+            if line is None and tick <= self.t[-1]:
+                line = self.spectrogram_graph.addLine(x=tick, pen=pg.mkPen('r', width=2))
+                line.setZValue(20)
+                self.spectrogram_ticks[tick] = line
+            elif line and tick < self.t[-1] - self.stft.span:
+                self.spectrogram_graph.removeItem(line)
+                self.spectrogram_ticks[tick] = False  # scrolled out, never redrawn
+        self.spectrogram_graph.setXRange(self.t[-1] - self.stft.span, self.t[-1], padding=0)
+
+    def update_erp(self):
+        '''
+        epoch store's running sums -> averaged waveform per event id; nothing is redrawn until a new epoch completes
+        '''
+        state = (self.epoch_store.n_clears, self.epoch_store.n_epochs)
+        if state == self.erp_state:
+            return
+        self.erp_state = state
+        erp_sums = dict(self.epoch_store.erp_sums)
+        for event_id in [event_id for event_id in self.erp_curves if event_id not in erp_sums]:
+            self.erp_graph.removeItem(self.erp_curves.pop(event_id))  # cleared by a new test; legend entry too
+        for event_id, (total, count) in erp_sums.items():
+            curve = self.erp_curves.get(event_id)
+            if curve is None:
+                pen = pg.mkPen(pg.intColor(len(self.erp_curves), hues=8), width=2)
+                curve = self.erp_graph.plot(pen=pen, name=self.triggers.name(event_id))
+                self.erp_curves[event_id] = curve
+            curve.setData(x=self.epoch_store.times, y=total.mean(axis=0) / count)
+            self.erp_graph.plotItem.legend.getLabel(curve).setText(f"{self.triggers.name(event_id)} (n={count})")
+
     @Slot(dict)
     def process_maze_data(self, maze_data):
         # Handle maze data received from the maze application
@@ -399,7 +648,7 @@ class ClientWindow(QMainWindow):
         print(f"[ClientWindow] Processing maze data: {maze_data}")
         event = maze_data.get('triggerID', '')
         if event:
-            self.insert_marker()
+            self.insert_marker(self.triggers.code(event))
             tick = time.time()
             self.ticks[tick] = None
 
@@ -419,6 +668,10 @@ class ClientWindow(QMainWindow):
         if self.test_running:
             QMessageBox.warning(self, "Test Running", "A test is already in progress.")
             return
+        if self.export_thread is not None and self.export_thread.isRunning():
+            # the export still reads the last test's epochs, which the new test would overwrite
+            QMessageBox.warning(self, "Export Running", "Wait for the export to finish before starting a test.")
+            return
 
         name = self.name_input.text().strip()
         age = self.age_input.text().strip()
@@ -442,14 +695,17 @@ class ClientWindow(QMainWindow):
         self.test_running = True
         self.test_paused = False
         self.test_start_time = time.time()
+        self.test_end_time = None
+        self.session = None
+        entry = self.recorder.start(name, age)
+        self.epoch_store.clear(entry['first_sample'])  # results, ERP and export cover this test only
         self.elapsed_time = 0
+        self.score_history = []
         self.pass_fail_result = None
         self.score = 0
         self.score_label.setText("Visuospatial Processing Score: 0 - N/A")
         self.score_label.setStyleSheet("font-size: 24px; font-weight: bold; color: gray;")
-        self.eeg_graph.clear()  # Clear existing EEG plots
-        for i in range(self.eeg_channels):
-            self.curves[i] = self.eeg_graph.plot(pen=pg.mkPen(self.colors[i], width=1), name=f"Channel {i+1}")
+        self.create_curves()  # Clear existing EEG plots
 
         self.start_test_button.setEnabled(False)
         self.pause_test_button.setEnabled(True)
@@ -488,6 +744,8 @@ class ClientWindow(QMainWindow):
             return
 
         self.test_timer.stop()
+        self.test_end_time = time.time()
+        self.session = self.recorder.stop()
         self.test_running = False
         self.test_paused = False
         self.start_test_button.setEnabled(True)
@@ -526,14 +784,28 @@ class ClientWindow(QMainWindow):
         self.score_label.setText("Visuospatial Processing Score: 0 - N/A")
         self.score_label.setStyleSheet("font-size: 24px; font-weight: bold; color: gray;")
         self.progress_bar.setValue(0)
-        self.eeg_graph.clear()
-        for i in range(self.eeg_channels):
-            self.curves[i] = self.eeg_graph.plot(pen=pg.mkPen(self.colors[i], width=1), name=f"Channel {i+1}")
+        self.create_curves()
 
         self.reset_test_button.setEnabled(False)
         print("[ClientWindow] All test data has been reset.")
         QMessageBox.information(self, "Test Reset", "All test data has been reset.")
 
+    def show_results(self):
+        print("[ClientWindow] Theta Results button clicked.")
+        if self.results_window is None:
+            self.results_window = result.Results(store=self.epoch_store, live=True, triggers=self.triggers)
+        self.results_window.show()
+
+    def show_overview(self):
+        print("[ClientWindow] Session Overview button clicked.")
+        entry = self.recorder.entry or self.session  # the test being recorded, else the last one
+        if entry is None:
+            self.overview_window = overview.Overview()  # latest catalogued session
+        else:
+            self.overview_window = overview.Overview(fname=session_file(entry), board_id=self.board_id,
+                                                     live=self.recorder.recording)
+        self.overview_window.show()
+
     def export_results(self):
         print("[ClientWindow] Export Results button clicked.")
         if not self.pass_fail_result:
@@ -545,35 +817,71 @@ class ClientWindow(QMainWindow):
             self,
             "Save Results",
             "",
-            "CSV Files (*.csv);;All Files (*)",
+            "Session Bundles (*.zip);;All Files (*)",
             options=options
         )
-        if file_path:
-            try:
-                with open(file_path, mode='w', newline='') as file:
-                    writer = csv.writer(file)
-                    writer.writerow([
-                        "Patient Name",
-                        "Age",
-                        "Result",
-                        "Visuospatial Processing Score",
-                        "Timestamp"
-                    ])
-                    writer.writerow([
-                        self.name_input.text().strip(),
-                        self.age_input.text().strip(),
-                        self.pass_fail_result,
-                        self.score,
-                        datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    ])
-                QMessageBox.information(self, "Export Successful", f"Results exported to {file_path}")
-                print(f"[ClientWindow] Results exported to {file_path}")
-            except Exception as e:
-                QMessageBox.critical(self, "Export Failed", f"An error occurred while exporting results:\n{e}")
-                print(f"[ClientWindow] Export failed: {e}")
+        if not file_path:
+            return
+        if self.session is None:
+            QMessageBox.warning(self, "No Recording", "This test has no recorded session to export.")
+            return
+        if self.export_thread is not None and self.export_thread.isRunning():
+            QMessageBox.warning(self, "Export Running", "An export is already in progress.")
+            return
+
+        metadata = {
+            'session_id': self.session['session_id'],
+            'patient_name': self.name_input.text().strip(),
+            'age': self.age_input.text().strip(),
+            'result': self.pass_fail_result,
+            'score': self.score,
+            'exported_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'test_duration_s': self.test_duration,
+            'elapsed_s': self.elapsed_time,
+            'test_start_time': self.test_start_time,
+            'test_end_time': self.test_end_time,
+            'n_epochs': self.epoch_store.n_epochs,
+            'n_rejected_epochs': self.epoch_store.n_rejected,
+        }
+        # Packaged in the background; the GUI only sees progress updates
+        fname = session_file(self.session)
+        self.export_thread = ExportThread(
+            file_path, fname, self.board_id, metadata,
+            epoch_store=self.epoch_store,
+            score_history=list(self.score_history),
+            bad_spans_fname=bad_spans_path(fname),
+            triggers_fname=triggers_path(fname),
+            first_sample=int(self.session['first_sample']),
+        )
+        self.export_thread.progress_signal.connect(self.update_export_progress)
+        self.export_thread.finished_signal.connect(self.export_finished)
+        self.export_button.setEnabled(False)
+        self.progress_bar.setMaximum(100)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("Exporting: 0%")
+        self.export_thread.start()
+        print(f"[ClientWindow] Exporting results to {file_path}")
+
+    @Slot(int)
+    def update_export_progress(self, percent):
+        self.progress_bar.setValue(percent)
+        self.progress_bar.setFormat(f"Exporting: {percent}%")
+
+    @Slot(str, str)
+    def export_finished(self, file_path, error):
+        self.export_button.setEnabled(True)
+        if error:
+            self.progress_bar.setFormat("Export failed")
+            QMessageBox.critical(self, "Export Failed", f"An error occurred while exporting results:\n{error}")
+            print(f"[ClientWindow] Export failed: {error}")
+        else:
+            self.progress_bar.setFormat("Export complete")
+            QMessageBox.information(self, "Export Successful", f"Results exported to {file_path}")
+            print(f"[ClientWindow] Results exported to {file_path}")
 
     def monitor_test(self):
         self.elapsed_time += 1
+        self.score_history.append((self.elapsed_time, self.score))
         self.progress_bar.setValue(self.elapsed_time)
         self.progress_bar.setFormat(f"Test Progress: {self.elapsed_time}/{self.test_duration}/s")
         print(f"[ClientWindow] Test progress: {self.elapsed_time}/{self.test_duration} seconds.")
@@ -585,6 +893,8 @@ class ClientWindow(QMainWindow):
     def end_test(self):
         print("[ClientWindow] Ending test due to duration.")
         self.test_timer.stop()
+        self.test_end_time = time.time()
+        self.session = self.recorder.stop()
         self.test_running = False
         self.test_paused = False
         self.start_test_button.setEnabled(True)
@@ -619,6 +929,11 @@ class ClientWindow(QMainWindow):
             self.data_thread.stop()
         if hasattr(self, 'maze_thread'):
             self.maze_thread.stop()
+        self.recorder.stop()  # a test still running is saved and catalogued
+        if self.publisher is not None:
+            self.publisher.close()
+        if self.export_thread is not None:
+            self.export_thread.wait()  # let a running export finish its archive
         event.accept()
 
 if __name__ == "__main__":
@@ -639,4 +954,6 @@ if __name__ == "__main__":
 
     client = ClientWindow(board_id=board_id, params=params, maze_host=maze_host, maze_port=maze_port)
     client.show()
+    report_import_times()
+    preload('scipy.signal')  # the acquisition thread needs it when the first epoch completes
     sys.exit(app.exec())
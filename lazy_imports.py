@@ -0,0 +1,75 @@
+import importlib
+import os
+import sys
+import threading
+import time
+import types
+
+# Set NNS_EAGER_IMPORTS=1 to load everything up front (e.g. to surface a broken install at launch)
+EAGER = os.environ.get('NNS_EAGER_IMPORTS') == '1'
+
+import_times = {}  # module name -> seconds spent importing it (only the first, real import counts)
+proxies = {}  # module name -> its LazyModule, so preload can load the same one
+
+
+def timed_import(name):
+    '''
+    module name -> module, recording how long the import took
+    '''
+    already_loaded = name in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if not already_loaded:
+        import_times[name] = time.perf_counter() - start
+    return module
+
+
+# Module stand-in that performs the real import on first attribute access
+class LazyModule(types.ModuleType):
+    def __init__(self, name):
+        super().__init__(name)
+        self._module = None
+        self._lock = threading.Lock()  # first use may race a preload
+
+    def _load(self, when="on first use"):
+        with self._lock:
+            if self._module is None:
+                self._module = timed_import(self.__name__)
+                if self.__name__ in import_times:
+                    print(f"[LazyImport] {self.__name__} loaded {when} in {import_times[self.__name__]:.3f} s")
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+def lazy_module(name):
+    '''
+    module name -> module proxy; the import is deferred until the module is first used
+    '''
+    if EAGER:
+        return timed_import(name)
+    return proxies.setdefault(name, LazyModule(name))
+
+
+def preload(*names, delay=1.0):
+    '''
+    module names -> imported in a background thread after delay seconds, so a lazy module needed on a
+    time-critical path (e.g. the acquisition thread) is ready before that path first uses it
+    '''
+    def run():
+        time.sleep(delay)  # let the window finish showing first
+        for name in names:
+            if name in proxies:
+                proxies[name]._load("in the background")
+            else:
+                timed_import(name)
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def report_import_times(label="Startup"):
+    total = sum(import_times.values())
+    print(f"[{label}] Import time breakdown ({total:.3f} s total):")
+    for name, seconds in sorted(import_times.items(), key=lambda item: -item[1]):
+        print(f"[{label}]   {name:<28} {seconds:.3f} s")
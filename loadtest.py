@@ -0,0 +1,212 @@
+import argparse
+import json
+import socket
+import threading
+import time
+
+import numpy as np
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QTimer
+from brainflow.board_shim import BoardShim, BoardIds
+
+import client
+from SharedStream import SharedStreamReader
+
+
+# Stand-in for the Unity maze: connects to the client's receiver port and sends trigger JSON
+class MazeSimulator(threading.Thread):
+    def __init__(self, host='localhost', port=12345, rate=2.0, burst=1, duration=30, trigger_ids=('T1', 'T2', 'T3')):
+        '''
+        rate: triggers per second on average
+        burst: triggers sent back to back each time; bursts are spaced to keep the average rate
+        '''
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.burst = burst
+        self.duration = duration
+        self.trigger_ids = trigger_ids
+        self.sent = []  # (seq, trigger ID, time sent)
+        self.is_running = True
+
+    def connect(self, timeout=10):
+        deadline = time.time() + timeout
+        while True:
+            try:
+                return socket.create_connection((self.host, self.port), timeout=1.0)
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.2)  # receiver not listening yet
+
+    def run(self):
+        sock = self.connect()
+        print(f"[MazeSimulator] Connected to {self.host}:{self.port}.")
+        period = self.burst / self.rate
+        start = time.perf_counter()
+        seq = 0
+        while self.is_running and time.perf_counter() - start < self.duration:
+            for _ in range(self.burst):
+                trigger_id = self.trigger_ids[seq % len(self.trigger_ids)]
+                # seq and sentAt ride along for the measurements; the client only reads triggerID
+                sent_at = time.time()
+                sock.sendall(json.dumps({'triggerID': trigger_id, 'seq': seq, 'sentAt': sent_at}).encode('utf-8'))
+                self.sent.append((seq, trigger_id, sent_at))
+                seq += 1
+            time.sleep(max(0.0, start + (seq // self.burst) * period - time.perf_counter()))
+        sock.close()
+        print(f"[MazeSimulator] Sent {seq} triggers.")
+
+    def stop(self):
+        self.is_running = False
+        self.join()
+
+
+# ClientWindow with timing hooks around the maze -> marker path and the EEG redraw
+class InstrumentedClient(client.ClientWindow):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)  # signals are queued until the event loop runs
+        self.received = []  # (seq, time process_maze_data got it)
+        self.inserted = []  # (seq, marker code, time insert_marker returned)
+        self.frame_times = []  # seconds spent in each update_eeg_data
+        self.seq = None
+
+    def process_maze_data(self, maze_data):
+        self.seq = maze_data.get('seq')
+        self.received.append((self.seq, time.time()))
+        super().process_maze_data(maze_data)
+
+    def insert_marker(self, id=1):
+        super().insert_marker(id)
+        self.inserted.append((self.seq, id, time.time()))
+
+    def update_eeg_data(self, data):
+        start = time.perf_counter()
+        super().update_eeg_data(data)
+        self.frame_times.append(time.perf_counter() - start)
+
+
+# Collects what the client actually wrote to the board: marker samples read back from the shared stream
+class MarkerMonitor:
+    def __init__(self, board_id):
+        self.marker_channel = BoardShim.get_marker_channel(board_id)
+        self.timestamp_channel = BoardShim.get_timestamp_channel(board_id)
+        self.reader = None
+        self.position = 0
+        self.markers = []  # (board timestamp, code)
+
+    def poll(self):
+        if self.reader is None:
+            try:
+                self.reader = SharedStreamReader()
+            except FileNotFoundError:
+                return
+        data, self.position = self.reader.read(since=self.position)
+        idx = np.flatnonzero(data[self.marker_channel] > 0)  # leaves out Board.GAP_MARKER
+        self.markers.extend(zip(data[self.timestamp_channel, idx].tolist(), data[self.marker_channel, idx].tolist()))
+
+
+# Measures how far apart the heartbeat timer actually fires: the GUI thread was busy for the difference
+class EventLoopProbe:
+    def __init__(self, interval_ms=10):
+        self.interval = interval_ms / 1000
+        self.lags = []
+        self.last = None
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.beat)
+        self.timer.start(interval_ms)
+
+    def beat(self):
+        now = time.perf_counter()
+        if self.last is not None:
+            self.lags.append(max(0.0, now - self.last - self.interval))
+        self.last = now
+
+
+def summary(values, scale=1000):
+    '''
+    -> "p50 / p95 / max" of values, in ms by default
+    '''
+    if len(values) == 0:
+        return "n/a"
+    p50, p95, worst = np.percentile(np.asarray(values) * scale, (50, 95, 100))
+    return f"{p50:.1f} / {p95:.1f} / {worst:.1f}"
+
+
+def report(maze, window, monitor, probe, elapsed):
+    sent = {seq: sent_at for seq, _, sent_at in maze.sent}
+    received = {seq for seq, _ in window.received}
+    insert_latency = [t - sent[seq] for seq, _, t in window.inserted if seq in sent]
+    n = min(len(window.inserted), len(monitor.markers))
+    # markers leave the board in insertion order, so the k-th in the stream is the k-th inserted
+    placement = [monitor.markers[k][0] - window.inserted[k][2] for k in range(n)]
+    codes_match = all(monitor.markers[k][1] == window.inserted[k][1] for k in range(n))
+
+    print()
+    print(f"Load test: {maze.rate:g} triggers/s in bursts of {maze.burst}, {elapsed:.1f} s")
+    print(f"  Triggers sent:                 {len(sent)}")
+    print(f"  Received by the client:        {len(received)} ({len(set(sent) - received)} dropped at the receiver)")
+    print(f"  Markers inserted:              {len(window.inserted)}")
+    if monitor.reader is not None:
+        print(f"  Markers in the board stream:   {len(monitor.markers)} "
+              f"({len(window.inserted) - len(monitor.markers)} lost after insertion, "
+              f"codes {'match' if codes_match else 'DO NOT match'})")
+    else:
+        print("  Markers in the board stream:   n/a (stream not shared)")
+    print("                                 p50 / p95 / max (ms)")
+    print(f"  Send -> marker inserted:       {summary(insert_latency)}")
+    print(f"  Inserted -> marker sample:     {summary(placement)}")
+    print(f"  EEG redraw (update_eeg_data):  {summary(window.frame_times)} "
+          f"over {len(window.frame_times)} frames ({len(window.frame_times) / elapsed:.1f}/s)")
+    print(f"  Event loop lag:                {summary(probe.lags)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive client.py with the synthetic board and a simulated maze.")
+    parser.add_argument('--rate', type=float, default=2.0, help="triggers per second")
+    parser.add_argument('--burst', type=int, default=1, help="triggers sent back to back per burst")
+    parser.add_argument('--duration', type=float, default=30, help="seconds of sending")
+    parser.add_argument('--triggers', default='T1,T2,T3', help="comma-separated trigger IDs to cycle through")
+    parser.add_argument('--port', type=int, default=12345, help="maze receiver port of the client")
+    args = parser.parse_args()
+
+    app = QApplication([])
+    board_id = BoardIds.SYNTHETIC_BOARD
+    window = InstrumentedClient(board_id=board_id, maze_host='localhost', maze_port=args.port)
+    window.show()
+    client.preload('scipy.signal')  # as client.py does once its window is up
+    monitor = MarkerMonitor(board_id)
+    probe = EventLoopProbe()
+    maze = MazeSimulator('localhost', args.port, args.rate, args.burst, args.duration,
+                         tuple(args.triggers.split(',')))
+
+    poll_timer = QTimer()
+    if window.publisher is not None:  # otherwise the stream under that name is another client's
+        poll_timer.timeout.connect(monitor.poll)
+        poll_timer.start(200)
+    start = time.perf_counter()
+    maze.start()
+
+    def finish():
+        if maze.is_alive():
+            QTimer.singleShot(200, finish)
+            return
+        # let the last markers reach the stream before reading it for the last time
+        QTimer.singleShot(1000, wrap_up)
+
+    def wrap_up():
+        poll_timer.stop()
+        if window.publisher is not None:
+            monitor.poll()
+        report(maze, window, monitor, probe, time.perf_counter() - start)
+        if monitor.reader is not None:
+            monitor.reader.close()
+        window.close()
+        app.quit()
+
+    QTimer.singleShot(int(args.duration * 1000), finish)
+    app.exec()
+
+if __name__ == "__main__":
+    main()
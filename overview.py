@@ -0,0 +1,128 @@
+from PySide6.QtWidgets import QApplication, QMainWindow, QLabel, QVBoxLayout, QWidget
+from PySide6.QtCore import QTimer, Slot
+import pyqtgraph as pg
+from brainflow.board_shim import BoardIds
+
+import numpy as np
+
+from Pyramid import PyramidReader, LEVELS, BASE, FACTOR
+from Sessions import find_session, session_file
+
+
+# Whole-session browser: every redraw reads one pyramid level, only over the visible range
+class Overview(QMainWindow):
+    def __init__(self, session_id=None, fname=None, board_id=BoardIds.GANGLION_BOARD, live=False):
+        '''
+        session_id: catalogued session to browse (default: the latest one)
+        fname: recording file to browse instead, e.g. the one still being recorded
+        live: keep extending the view while the recording grows
+        '''
+        super().__init__()
+        self.setWindowTitle("Session Overview")
+        self.reader = None
+        self.t_start = None
+        self.initUI()
+        if fname is None:
+            entry = find_session(session_id)
+            if entry is None:
+                print("[Overview] No recorded session found.")
+                self.status_label.setText("No recorded session found.")
+                return
+            fname, board_id = session_file(entry), int(entry['board_id'])
+        self.reader = PyramidReader(fname, board_id)
+
+        # Redraw once the view settles rather than on every intermediate range while dragging
+        self.redraw_timer = QTimer()
+        self.redraw_timer.setSingleShot(True)
+        self.redraw_timer.timeout.connect(self.refresh)
+        self.plotWidget.sigXRangeChanged.connect(lambda *args: self.redraw_timer.start(30))
+        if live:
+            self.live_timer = QTimer()
+            self.live_timer.timeout.connect(self.update_limits)
+            self.live_timer.start(1000)
+        self.update_limits(full=True)
+
+    def initUI(self):
+        layout = QVBoxLayout()
+        self.plotWidget = pg.PlotWidget(title="Session Overview")
+        self.plotWidget.setMouseEnabled(x=True, y=False)
+        self.plotWidget.setLabel('bottom', "Time", units="s")
+        # min/max envelopes and means of every channel, each drawn as one stacked curve
+        self.envelope = pg.PlotCurveItem(pen=pg.mkPen((100, 150, 255), width=1))
+        self.mean = pg.PlotCurveItem(pen=pg.mkPen('w', width=1))
+        self.plotWidget.addItem(self.envelope)
+        self.plotWidget.addItem(self.mean)
+        layout.addWidget(self.plotWidget)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        container = QWidget()
+        container.setLayout(layout)
+        self.setCentralWidget(container)
+
+    def update_limits(self, full=False):
+        '''
+        keep the scroll limits on the recorded span; full: also show all of it
+        '''
+        span = self.reader.span()
+        if span is None:
+            return
+        if self.t_start is None:
+            self.t_start = span[0]
+            self.scale_channels()
+        duration = span[1] - self.t_start
+        self.plotWidget.setLimits(xMin=0, xMax=duration)
+        if full:
+            self.plotWidget.setXRange(0, duration, padding=0)
+        self.refresh()
+
+    def scale_channels(self):
+        '''
+        one scale per channel from the coarsest level, so rows keep their height while zooming
+        '''
+        for level in reversed(range(LEVELS)):
+            blocks = self.reader.level(level)
+            if len(blocks) >= 8 or level == 0:
+                break
+        _, lo, hi, mean = self.reader.unpack(blocks)
+        self.centre = np.median(mean, axis=1, keepdims=True)
+        self.scale = np.median(hi - lo, axis=1, keepdims=True)
+        self.scale[~(self.scale > 0)] = 1
+        self.offsets = np.arange(len(self.centre))[:, None]
+        self.plotWidget.getAxis('left').setTicks([[(i, f"Ch {i+1}") for i in range(len(self.centre))]])
+
+    @Slot()
+    def refresh(self):
+        if self.t_start is None:
+            return
+        (x0, x1), _ = self.plotWidget.viewRange()
+        max_blocks = max(self.plotWidget.width(), 200)  # about one block per pixel
+        level, t, lo, hi, mean = self.reader.read(self.t_start + x0, self.t_start + x1, max_blocks)
+        if len(t) == 0:
+            return
+        x = t - self.t_start
+        n_channels = len(lo)
+        lo = (lo - self.centre) / self.scale + self.offsets
+        hi = (hi - self.centre) / self.scale + self.offsets
+        mean = (mean - self.centre) / self.scale + self.offsets
+
+        # Envelope: a vertical min -> max stroke per block; channel rows are not joined to each other
+        envelope_y = np.empty((n_channels, 2 * len(t)))
+        envelope_y[:, 0::2] = np.clip(lo, self.offsets - 0.5, self.offsets + 0.5)
+        envelope_y[:, 1::2] = np.clip(hi, self.offsets - 0.5, self.offsets + 0.5)
+        connect = np.ones((n_channels, 2 * len(t)), dtype=bool)
+        connect[:, -1] = False
+        self.envelope.setData(x=np.tile(np.repeat(x, 2), n_channels), y=envelope_y.ravel(), connect=connect.ravel())
+        connect = connect[:, :len(t)].copy()
+        connect[:, -1] = False
+        self.mean.setData(x=np.tile(x, n_channels), y=mean.ravel(), connect=connect.ravel())
+        self.status_label.setText(f"Level {level}: {len(t)} blocks of {BASE * FACTOR ** level} samples")
+
+
+if __name__ == "__main__":
+    app = QApplication([])
+
+    w = Overview()
+    w.show()
+
+    app.exec()
@@ -1,16 +1,76 @@
-from PySide6.QtWidgets import QApplication, QMainWindow, QPushButton, QLabel, QVBoxLayout, QWidget
+from PySide6.QtWidgets import (
+    QApplication, QMainWindow, QPushButton, QLabel, QVBoxLayout, QHBoxLayout, QWidget, QProgressBar
+)
+from PySide6.QtCore import QThread, QTimer, Signal, Slot
 import pyqtgraph as pg
-from brainflow.data_filter import DataFilter
-from brainflow.board_shim import BoardShim, BoardIds
+from brainflow.board_shim import BoardIds
 
-import mne
 import numpy as np
 
+from lazy_imports import lazy_module, report_import_times
+mne = lazy_module('mne')  # only the reference theta_power path needs it
+
+from Artifacts import BadSpanIndex
+from EpochStore import EpochStore, find_nearest, TMIN, TMAX
+from Sessions import find_session, session_file, epoch_file
+from Triggers import TriggerRegistry, triggers_path
+
+
+# Define the ThetaWorker to epoch a recorded session without blocking the GUI
+class ThetaWorker(QThread):
+    progress_signal = Signal(int)  # Emit percentage of the file processed
+    finished_signal = Signal(bool)  # Emit True if the whole session was processed, False if cancelled
+
+    def __init__(self, fname, board_id=BoardIds.GANGLION_BOARD):
+        super().__init__()
+        self.fname = fname
+        # Epochs land in the store chunk by chunk; the window reads it on every progress update
+        self.store = EpochStore(board_id, TMIN, TMAX, bad_spans=BadSpanIndex())
+        self.is_running = True
+
+    def run(self):
+        try:
+            for done in epoch_file(self.fname, self.store):
+                if not self.is_running:
+                    print("[ThetaWorker] Cancelled.")
+                    self.finished_signal.emit(False)
+                    return
+                self.progress_signal.emit(int(100 * done))
+            self.finished_signal.emit(True)
+        except Exception as e:
+            print(f"[ThetaWorker] Exception: {e}")
+            self.finished_signal.emit(False)
+
+    def stop(self):
+        self.is_running = False
+        self.wait()
+
 
 class Results(QMainWindow):
-    def __init__(self):
+    def __init__(self, store=None, session_id=None, fname=None, epochs=None, live=False, triggers=None):
+        '''
+        store: EpochStore fed by a running session; otherwise built from a recorded session
+        triggers: TriggerRegistry naming the conditions; otherwise the one saved with the session
+        session_id: catalogued session to analyse (default: the latest one)
+        fname: recording file to analyse instead of a catalogued session
+        epochs: optional slice/indices of trials to average (default: entire session)
+        live: keep refreshing the bars while the store fills up
+        '''
         super().__init__()
+        self.store = store
+        self.session_id = session_id
+        self.fname = fname
+        self.epochs = epochs
+        self.triggers = triggers if triggers is not None else TriggerRegistry()
+        self.conditions = []  # event ids of the bars, in order
+        self.worker = None
         self.initUI()
+        if live:
+            self.refresh_timer = QTimer()
+            self.refresh_timer.timeout.connect(self.update_bars)
+            self.refresh_timer.start(1000)
+        if self.store is None:
+            self.load_session()
 
     def initUI(self):
         layout = QVBoxLayout()
@@ -19,48 +79,99 @@ class Results(QMainWindow):
         self.plotWidget = pg.PlotWidget(title="Theta Activity", background=None)
         layout.addWidget(self.plotWidget)
 
-        # Sample data for the bar graph
-        x = [0]
-        y = self.calculate_theta()
-
-        # Create a bar graph item
-        barGraph = pg.BarGraphItem(x=x, height=y, width=0.6, brush='b')
-        self.plotWidget.addItem(barGraph)
-        ax = self.plotWidget.getAxis('bottom')
-        ax.setTicks([[(0, 'Easy')]])
+        # One bar per condition, added as conditions show up
+        self.barGraph = pg.BarGraphItem(x=[0], height=[0], width=0.6, brush='b')
+        self.plotWidget.addItem(self.barGraph)
+        self.update_bars()
+
+        # Loading status and cancel
+        status_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximum(100)
+        self.progress_bar.setVisible(False)
+        self.status_label = QLabel("")
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel)
+        self.cancel_button.setVisible(False)
+        status_layout.addWidget(self.status_label)
+        status_layout.addWidget(self.progress_bar)
+        status_layout.addWidget(self.cancel_button)
+        layout.addLayout(status_layout)
 
         container = QWidget()
         container.setLayout(layout)
         self.setCentralWidget(container)
 
+    def load_session(self):
+        board_id = BoardIds.GANGLION_BOARD
+        if self.fname is None:
+            entry = find_session(self.session_id)
+            if entry is None:
+                print("[Results] No recorded session found.")
+                self.status_label.setText("No recorded session found.")
+                return
+            self.fname = session_file(entry)
+            board_id = int(entry['board_id'])
+        if len(self.triggers) == 0:
+            self.triggers = TriggerRegistry.load(triggers_path(self.fname))
+
+        # get the data of this session only, epoching it in the background and skipping flagged segments
+        self.worker = ThetaWorker(self.fname, board_id)
+        self.store = self.worker.store
+        self.worker.progress_signal.connect(self.update_progress)
+        self.worker.finished_signal.connect(self.loading_finished)
+        self.status_label.setText("Loading session...")
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.cancel_button.setVisible(True)
+        self.worker.start()
+
+    @Slot(int)
+    def update_progress(self, percent):
+        self.progress_bar.setValue(percent)
+        self.update_bars()
+
+    @Slot(bool)
+    def loading_finished(self, completed):
+        self.update_bars()
+        self.progress_bar.setVisible(False)
+        self.cancel_button.setVisible(False)
+        n = sum(len(self.store.select(event_id, self.epochs)) for event_id in self.conditions)
+        if completed:
+            self.status_label.setText(f"{n} epochs, {self.store.n_rejected} rejected.")
+        else:
+            self.status_label.setText(f"Cancelled: partial result from {n} epochs.")
+
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.is_running = False
+
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.stop()
+        event.accept()
+
+    def update_bars(self):
+        conditions = self.conditions
+        theta = self.calculate_theta()
+        self.barGraph.setOpts(x=list(range(len(theta))), height=theta)
+        if self.conditions != conditions or not conditions:
+            labels = [self.triggers.name(event_id) for event_id in self.conditions] or ['Easy']
+            self.plotWidget.getAxis('bottom').setTicks([list(enumerate(labels))])
+
     def calculate_theta(self):
         '''
-        returns theta: list of theta values for each trial
+        returns theta: list of theta values, one per condition (event id) in the store
         '''
-        # get the data from eeg_data.csv
-        data = DataFilter.read_file('eeg_data.csv')
-        # calculate theta values
-        board_id = BoardIds.GANGLION_BOARD
-        channels = BoardShim.get_eeg_channels(board_id)
-        sr = BoardShim.get_sampling_rate(board_id)
-
-        channel_data = data[channels, :]
-        channel_data /= 1e6  # uV to V (ganglion reports in uV)
-        ch_names = [f"EEG{i}" for i in range(channel_data.shape[0])]
-        ch_types = ["eeg"] * channel_data.shape[0]
-        info = mne.create_info(ch_names, ch_types=ch_types, sfreq=sr)
-        raw = mne.io.RawArray(channel_data, info)  # input is (n_channels, n_samples)
-        tmin, tmax = -0.5, 1  # in seconds
-        markers = data[BoardShim.get_marker_channel(board_id), :]  # (n_samples, )
-        theta = [0]
-
-        # Easy event markers
-        power = theta_power(raw, markers, 1, tmin, tmax)
-        theta[0] = power
-        # power = theta_power(raw, markers, 2, tmin, tmax)
-        # theta[1] = power
-        return theta
+        if self.store is None:
+            return [0]
+
+        # every condition in one pass over the stored epochs
+        thetas = self.store.thetas(self.epochs)
+        self.conditions = sorted(thetas)
+        return [thetas[event_id] for event_id in self.conditions] or [0]
 
+# Reference mne implementation; EpochStore.band_power computes the same value without mne objects
 def theta_power(raw, markers, event_id, tmin, tmax):
     easy_event_indices = np.argwhere(markers == event_id)
     zeroes = np.zeros(easy_event_indices.shape)
@@ -69,7 +180,7 @@ def theta_power(raw, markers, event_id, tmin, tmax):
     epochs = mne.Epochs(raw, events, {f"{event_id}": event_id}, tmin, tmax)
     # epochs.plot(n_epochs=2, n_channels=4, events=True, scalings="auto")
 
-    spectrum = epochs.compute_psd()
+    spectrum = epochs.compute_psd(method='welch')  # same estimator as EpochStore
     psd, freqs = spectrum.get_data(return_freqs=True)
     # find nearest indices in freq that match up to 4 and 8 Hz
     i4 = find_nearest(freqs, 4)
@@ -79,15 +190,11 @@ def theta_power(raw, markers, event_id, tmin, tmax):
     power = np.mean(psd[:, :, i4:i8])
     return power
 
-def find_nearest(array, value):
-    array = np.asarray(array)
-    idx = (np.abs(array - value)).argmin()
-    return idx
-
 if __name__ == "__main__":
     app = QApplication([])
 
     w = Results()
     w.show()
+    report_import_times()
 
     app.exec()
\ No newline at end of file
@@ -7,42 +7,67 @@ import math
 import random
 from PySide6.QtCore import QThread, Signal, QObject
 from PySide6.QtWidgets import QApplication, QMainWindow, QTextEdit, QVBoxLayout, QWidget, QLabel
-import pickle
-from sklearn.linear_model import LogisticRegression
 import numpy as np
+from brainflow.board_shim import BoardShim
+
+from Scorer import OnlineScorer, LiveScorer
+from SharedStream import SharedStreamReader
+
+STALL_SECONDS = 3  # no new sample for this long: the client closed or lost its stream, so attach again
+
+def attach_stream():
+    '''
+    -> reader of the EEG stream published by the client, or None if it is not running
+    '''
+    try:
+        return SharedStreamReader()
+    except (FileNotFoundError, ValueError):
+        return None
 
 class ClientHandler(QThread):
     message_sent = Signal(str)
 
-    def __init__(self, client_socket, address, model=None):
+    def __init__(self, client_socket, address, live_scores=None):
         super().__init__()
         self.client_socket = client_socket
         self.address = address
         self.is_running = True
-        self.model = model  # Optional ML model
+        self.live_scores = live_scores  # Optional: -> LiveScorer shared by all handlers, or None
 
     def run(self):
         print(f"Client connected from {self.address}")
         start_time = time.time()
+        stream = None
         while self.is_running:
             elapsed = time.time() - start_time
 
-            # Simulate EEG data as sinusoidal waves with noise
-            eeg = [math.sin(2 * math.pi * 0.5 * elapsed + i) * 50 + random.uniform(-10, 10) for i in range(8)]
-            
-            # Optional: Predict navigation direction using ML model
-            if self.model:
-                eeg_array = np.array(eeg).reshape(1, -1)
-                prediction = self.model.predict(eeg_array)[0]
+            # Latest sample of the client's live stream when it is running, read from shared memory
+            if stream is not None and stream.stalled(STALL_SECONDS):
+                print("[Server] Live stream stopped; detaching from it.")
+                stream.close()
+                stream = None
+            if stream is None:
+                stream = attach_stream()
+            sample = stream.latest(1) if stream is not None else np.zeros((0, 0))
+            if sample.shape[1]:
+                eeg = sample[BoardShim.get_eeg_channels(stream.board_id), -1].tolist()
             else:
-                prediction = random.choice(['N', 'S', 'E', 'W'])
+                # Simulate EEG data as sinusoidal waves with noise
+                eeg = [math.sin(2 * math.pi * 0.5 * elapsed + i) * 50 + random.uniform(-10, 10) for i in range(8)]
+
+            # Optional: condition predicted from the latest epoch; each epoch is scored once and cached
+            live = self.live_scores() if self.live_scores else None
+            if live is not None:
+                live.update()
+            prediction = live.latest() if live is not None else None
 
             data = {
                 'timestamp': elapsed,
                 'eeg': eeg,
+                'prediction': prediction,
                 'navigation': {
                     'position': [random.randint(0, 100), random.randint(0, 100)],
-                    'direction': prediction
+                    'direction': random.choice(['N', 'S', 'E', 'W'])
                 }
             }
             message = json.dumps(data)
@@ -79,6 +104,8 @@ class ClientHandler(QThread):
 
 # -----------------------------------------------------------------------------------
             time.sleep(1)  # Send data every second
+        if stream is not None:
+            stream.close()
 
     def stop(self):
         self.is_running = False
@@ -96,6 +123,24 @@ class ServerThread(QThread):
         self.is_running = True
         self.model = model
         self.client_handlers = []
+        self.live = None
+        self.live_lock = threading.Lock()
+
+    def live_scores(self):
+        '''
+        -> the LiveScorer on the client's stream, once both a model and the stream are available
+        '''
+        with self.live_lock:
+            if self.live is not None and self.live.reader.stalled(STALL_SECONDS):
+                print("[ServerThread] Live stream stopped; detaching from it.")
+                self.live.close()
+                self.live = None
+            if self.live is None and self.model is not None:
+                stream = attach_stream()
+                if stream is not None and stream.board_id == self.model.board_id:
+                    self.live = LiveScorer(self.model, stream)
+                    print("[ServerThread] Scoring the live stream.")
+            return self.live
 
     def run(self):
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
@@ -107,7 +152,7 @@ class ServerThread(QThread):
                 try:
                     client_socket, addr = server_socket.accept()
                     print(f"[ServerThread] Client connected: {addr}")  # Debugging log
-                    handler = ClientHandler(client_socket, addr, self.model)
+                    handler = ClientHandler(client_socket, addr, self.live_scores)
                     handler.message_sent.connect(self.message_sent.emit)
                     handler.start()
                     self.client_handlers.append(handler)
@@ -141,14 +186,12 @@ class MainWindow(QMainWindow):
         container.setLayout(layout)
         self.setCentralWidget(container)
 
-        # Load ML model if available
-        try:
-            with open('predictor_model.pkl', 'rb') as f:
-                self.model = pickle.load(f)
-            print("ML model loaded successfully.")
-        except FileNotFoundError:
+        # Load ML model if available (trained by running Scorer.py)
+        self.model = OnlineScorer.load()
+        if self.model is not None:
+            print(f"ML model loaded successfully: {self.model.n_trained} epochs, classes {self.model.classes.tolist()}.")
+        else:
             print("ML model not found. Continuing without it.")
-            self.model = None
 
         self.server_thread = ServerThread(host=server_host, port=server_port, model=self.model)
         self.server_thread.message_sent.connect(self.display_message)